@@ -0,0 +1,112 @@
+from dag_executor import DagExecutor, Node
+from google_utils import create_doc_with_content, create_slides_presentation, share_file_permissions, send_gmail
+from llm_helper import generate_project_plan, generate_slides_outline
+from prompt_builder import build_prompt, estimate_tokens
+
+# 🟢 The agent workflow as a real dependency graph:
+#   LLM (Docs) -> Create Doc -> Share Doc --\
+#                                            >-> Send Email
+#   LLM (Slides) -> Create Slide -> Share Slide -/
+# Docs and Slides branches run in parallel; each file is shared as soon as it exists.
+# Nodes never call st.*: they run on worker threads, so problems are returned in their outputs
+# and rendered by the app on the script thread.
+
+
+class StageError(Exception):
+    """A stage finished without a usable result (e.g. the Google API returned no link)."""
+
+
+def compose_email(course_name, doc_url=None, slide_url=None):
+    subject = f"[{course_name}] 期末報告分工通知 (AI Agent)"
+
+    links_text = ""
+    if doc_url: links_text += f"📄 企劃書連結：{doc_url}\n"
+    if slide_url: links_text += f"📊 簡報連結：{slide_url}\n"
+
+    body = f"""
+    各位同學好：
+
+    這是一封由 AI Agent 自動發送的通知。
+    針對 {course_name} 的期末報告，我已經根據作業 PDF 產生了初步架構。
+
+    請大家到以下連結開始協作：
+    {links_text}
+
+    祝 報告順利！
+    """
+    return subject, body
+
+
+def build_agent_pipeline(services, use_docs=True, use_slides=False, prompt_renderer=build_prompt,
+                         take_prefetched_docs=None, max_workers=4, initializer=None):
+    """
+    Returns a DagExecutor for the selected formats.
+    Run it with a context holding: course_name, members, pdf_text, today, deadline, emails.
+    `prompt_renderer` lets the app plug in its cached renderer (app_cache.render_prompt).
+    `take_prefetched_docs()` returns a speculative Docs plan or None; it may block until the speculation
+    finishes, so it is called inside the llm_docs node where it only holds up the Docs branch.
+    """
+    gmail_svc, drive_svc, docs_svc, slides_svc = services
+    nodes = []
+    share_outputs = []
+
+    if use_docs:
+        def llm_docs(course_name, members, pdf_text, today, deadline):
+            plan = take_prefetched_docs() if take_prefetched_docs else None
+            if plan:
+                return {"plan_docs": plan, "docs_prefetched": True}
+            prompt = prompt_renderer(course_name, members, pdf_text, today, deadline, "Docs")
+            plan = generate_project_plan(course_name, members, pdf_text, today, deadline, "Docs", prompt=prompt)
+            return {"plan_docs": plan, "docs_prompt_tokens": estimate_tokens(prompt)}
+
+        def create_doc(course_name, plan_docs):
+            doc_id, result = create_doc_with_content(docs_svc, drive_svc, f"[{course_name}] 期末報告企劃書", plan_docs)
+            if not doc_id or not result:
+                raise StageError(result or "企劃書建立失敗 (API 回傳空值)")
+            return {"doc_id": doc_id, "doc_url": result}
+
+        def share_doc(doc_id, emails):
+            return {"doc_shared": True, "doc_share_failed": share_file_permissions(drive_svc, doc_id, emails)}
+
+        nodes += [
+            Node("llm_docs", llm_docs, ["course_name", "members", "pdf_text", "today", "deadline"],
+                 ["plan_docs"], label="LLM Analysis (Docs)"),
+            Node("create_doc", create_doc, ["course_name", "plan_docs"], ["doc_id", "doc_url"], label="Create Doc"),
+            Node("share_doc", share_doc, ["doc_id", "emails"], ["doc_shared", "doc_share_failed"],
+                 label="Share Doc"),
+        ]
+        share_outputs += ["doc_url", "doc_shared"]
+
+    if use_slides:
+        def llm_slides(course_name, members, pdf_text, today, deadline):
+            prompt = prompt_renderer(course_name, members, pdf_text, today, deadline, "Slides")
+            outline = generate_slides_outline(course_name, members, pdf_text, today, deadline, prompt=prompt)
+            return {"slides_outline": outline, "slides_prompt_tokens": estimate_tokens(prompt)}
+
+        def create_slides(course_name, slides_outline):
+            slide_id, result = create_slides_presentation(slides_svc, drive_svc, f"[{course_name}] 期末報告簡報", slides_outline)
+            if not slide_id:
+                raise StageError(f"簡報建立失敗 (JSON 解析錯誤或 API 權限問題): {result}")
+            return {"slide_id": slide_id, "slide_url": result}
+
+        def share_slides(slide_id, emails):
+            return {"slides_shared": True, "slides_share_failed": share_file_permissions(drive_svc, slide_id, emails)}
+
+        nodes += [
+            Node("llm_slides", llm_slides, ["course_name", "members", "pdf_text", "today", "deadline"],
+                 ["slides_outline"], label="LLM Analysis (Slides)"),
+            Node("create_slides", create_slides, ["course_name", "slides_outline"], ["slide_id", "slide_url"],
+                 label="Create Slide"),
+            Node("share_slides", share_slides, ["slide_id", "emails"], ["slides_shared", "slides_share_failed"],
+                 label="Share Slide"),
+        ]
+        share_outputs += ["slide_url", "slides_shared"]
+
+    def send_email(course_name, emails, **shared):
+        subject, body = compose_email(course_name, shared.get("doc_url"), shared.get("slide_url"))
+        sent, failed = send_gmail(gmail_svc, emails, subject, body)
+        return {"emails_sent": sent, "emails_failed": failed}
+
+    nodes.append(Node("send_email", send_email, ["course_name", "emails"] + share_outputs,
+                      ["emails_sent", "emails_failed"], label="Send Email"))
+    return DagExecutor(nodes, max_workers=max_workers, initializer=initializer)
@@ -0,0 +1,132 @@
+import io
+import hashlib
+import threading
+import streamlit as st
+from config import get_settings
+from google_utils import get_google_service
+from llm_helper import extract_text_from_pdf
+from prompt_builder import build_prompt
+
+# 🟢 Caching layer for Streamlit reruns
+# - cache_resource: process-wide objects shared by every session (Google services per credential)
+# - cache_data: pure derived data, keyed by input, expires after a TTL
+DATA_TTL_SECONDS = 60 * 60
+PROMPT_TTL_SECONDS = 15 * 60
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(name, field):
+    with _stats_lock:
+        entry = _stats.setdefault(name, {"calls": 0, "misses": 0})
+        entry[field] += 1
+
+
+# --- Process-wide resources ---
+@st.cache_resource(show_spinner=False)
+def _services_for_credential(fingerprint, _creds):
+    # `_creds` is excluded from the cache key; `fingerprint` identifies the account
+    from google_utils import build_services
+    _record("google_services", "misses")
+    return build_services(_creds)
+
+
+def credential_fingerprint(creds):
+    """Stable per-account key: survives access-token refreshes."""
+    if creds is None:
+        return "replay"
+    identity = f"{getattr(creds, 'client_id', '')}:{getattr(creds, 'refresh_token', None) or creds.token}"
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+def get_services():
+    """Like google_utils.get_google_service(), but discovery-built services are reused across sessions."""
+    _record("google_services", "calls")
+    return get_google_service(builder=lambda creds: _services_for_credential(credential_fingerprint(creds), creds))
+
+
+# --- Pure derived data ---
+def pdf_fingerprint(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, max_entries=64, show_spinner=False)
+def _pdf_text(pdf_hash, _pdf_bytes):
+    _record("pdf_text", "misses")
+    return extract_text_from_pdf(io.BytesIO(_pdf_bytes))
+
+
+def get_pdf_text(uploaded_file):
+    """Extracts PDF text once per distinct file content (keyed by SHA-256)."""
+    return pdf_text_for_bytes(uploaded_file.getvalue())
+
+
+def pdf_text_for_bytes(pdf_bytes, pdf_hash=None):
+    """Same cache as get_pdf_text(); usable from background threads (see prefetch.py)."""
+    _record("pdf_text", "calls")
+    return _pdf_text(pdf_hash or pdf_fingerprint(pdf_bytes), pdf_bytes)
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, max_entries=256, show_spinner=False)
+def _normalize_recipients(raw_ids, default_domain):
+    _record("recipients", "misses")
+    student_ids_list = [s.strip() for s in raw_ids.split(',') if s.strip()]
+    return [f"{sid}@{default_domain}" if "@" not in sid else sid for sid in student_ids_list]
+
+
+def normalize_recipients(raw_ids, default_domain):
+    """Turns 'f74122030, bob@gmail.com' into full email addresses."""
+    _record("recipients", "calls")
+    return _normalize_recipients(raw_ids, default_domain)
+
+
+@st.cache_data(ttl=PROMPT_TTL_SECONDS, max_entries=32, show_spinner=False)
+def _render_prompt(course_name, members, assignment_text, current_date, due_date, output_format):
+    _record("prompts", "misses")
+    return build_prompt(course_name, members, assignment_text, current_date, due_date, output_format)
+
+
+def render_prompt(course_name, members, assignment_text, current_date, due_date, output_format="Docs"):
+    _record("prompts", "calls")
+    return _render_prompt(course_name, members, assignment_text, current_date, due_date, output_format)
+
+
+CACHES = {
+    "google_services": _services_for_credential,
+    "pdf_text": _pdf_text,
+    "recipients": _normalize_recipients,
+    "prompts": _render_prompt,
+}
+
+
+def cache_stats():
+    """Calls / misses / hits per cache since process start."""
+    with _stats_lock:
+        snapshot = {name: dict(_stats.get(name, {"calls": 0, "misses": 0})) for name in CACHES}
+    for entry in snapshot.values():
+        entry["hits"] = max(0, entry["calls"] - entry["misses"])
+    return snapshot
+
+
+def clear_cache(name=None):
+    """Clears one cache by name, or all of them when name is None."""
+    for cache_name in ([name] if name else CACHES):
+        CACHES[cache_name].clear()
+        with _stats_lock:
+            _stats.pop(cache_name, None)
+
+
+def render_cache_admin():
+    """
+    Sidebar admin panel: inspect hit rates and clear caches.
+    Clearing affects every session (including cached Google services), so it is only shown with ADMIN_MODE=true.
+    """
+    if not get_settings().admin_mode:
+        return
+    with st.expander("🧹 快取管理 (Cache Admin)"):
+        st.json(cache_stats())
+        target = st.selectbox("選擇快取", ["(全部)"] + list(CACHES))
+        if st.button("清除快取"):
+            clear_cache(None if target == "(全部)" else target)
+            st.success(f"已清除: {target}")
@@ -0,0 +1,77 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+# .env lives in the project root, one level above src/
+ENV_PATH = Path(__file__).parent.parent / '.env'
+
+DEFAULT_MODELS = {
+    "openai": "gpt-4o",
+    "gemini": "gemini-1.5-flash",
+    "ollama": "llama3",
+    "ncku": "gpt-oss:120b"
+}
+
+
+@dataclass(frozen=True)
+class Settings:
+    llm_provider: str
+    api_key: str
+    model_name: str
+    api_url: str
+    default_email_domain: str
+    # Record / replay of external HTTP traffic (see traffic_recorder.py)
+    traffic_mode: str = "off"
+    cassette_path: str = "cassettes/session.json"
+    replay_speed: float = 1.0
+    # Start PDF parsing / Docs generation before the form is submitted (see prefetch.py)
+    speculative_prefetch: bool = False
+    # Memory bounds (see memory_guard.py): max upload size, max extracted characters per upload
+    max_upload_mb: int = 20
+    max_assignment_chars: int = 60000
+    # Show process-wide admin controls (cache stats / clear) in the sidebar
+    admin_mode: bool = False
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """Loads .env into os.environ exactly once per process (not on every Streamlit rerun)."""
+    from dotenv import load_dotenv
+    return load_dotenv(dotenv_path=ENV_PATH, override=True)
+
+
+def env_number(key, default, cast):
+    """Reads a numeric env var; a malformed value warns and falls back to `default` instead of crashing the page."""
+    value = os.getenv(key)
+    if value in (None, ""):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"⚠️ Invalid value for {key}: {value!r}, using {default}")
+        return default
+
+
+@lru_cache(maxsize=None)
+def get_settings():
+    """
+    Parses the configuration once and caches it.
+    Call get_settings.cache_clear() after editing .env to pick up changes without a restart.
+    """
+    load_env()
+    provider = os.getenv("LLM_PROVIDER", "ncku").lower()
+    return Settings(
+        llm_provider=provider,
+        api_key=os.getenv("API_KEY", ""),
+        model_name=os.getenv("MODEL_NAME", DEFAULT_MODELS.get(provider, "gpt-4o")),
+        api_url=os.getenv("API_URL", ""),
+        default_email_domain=os.getenv("DEFAULT_EMAIL_DOMAIN", "gs.ncku.edu.tw"),
+        traffic_mode=os.getenv("GPA_TRAFFIC_MODE", "off").lower(),
+        cassette_path=os.getenv("GPA_CASSETTE", "cassettes/session.json"),
+        replay_speed=env_number("GPA_REPLAY_SPEED", 1.0, float),
+        speculative_prefetch=os.getenv("SPECULATIVE_PREFETCH", "false").lower() in ("1", "true", "yes"),
+        max_assignment_chars=env_number("MAX_ASSIGNMENT_CHARS", 60000, int),
+        max_upload_mb=env_number("MAX_UPLOAD_MB", 20, int),
+        admin_mode=os.getenv("ADMIN_MODE", "false").lower() in ("1", "true", "yes"),
+    )
@@ -0,0 +1,188 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# 🟢 Small DAG execution engine
+# Each node declares the context keys it reads (inputs) and writes (outputs).
+# Edges are derived from those declarations, so a node starts as soon as the nodes
+# producing its inputs have finished; independent nodes run in parallel on the worker pool.
+
+STATUS_COLORS = {
+    "pending": "lightgrey",
+    "running": "lightblue",
+    "done": "lightgreen",
+    "failed": "salmon",
+    "skipped": "white",
+}
+
+
+class Node:
+    """One pipeline stage: fn(**inputs) -> dict containing every name in `outputs`."""
+
+    def __init__(self, name, fn, inputs=(), outputs=(), label=None):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.label = label or name
+
+
+class DagExecutor:
+    def __init__(self, nodes, max_workers=4, initializer=None):
+        """
+        `initializer` runs in every worker thread before its first node (per-thread setup).
+        Nodes should not call st.*: Streamlit only supports UI calls from the script thread,
+        so nodes return what to show and on_event renders it.
+        """
+        self.nodes = {}
+        self.producers = {}
+        for node in nodes:
+            if node.name in self.nodes:
+                raise ValueError(f"Duplicate node: {node.name}")
+            self.nodes[node.name] = node
+            for key in node.outputs:
+                if key in self.producers:
+                    raise ValueError(f"'{key}' is produced by both {self.producers[key]} and {node.name}")
+                self.producers[key] = node.name
+        self.deps = {
+            name: {self.producers[key] for key in node.inputs if key in self.producers}
+            for name, node in self.nodes.items()
+        }
+        self._check_acyclic()
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.lock = threading.Lock()
+        self.reset()
+
+    def _check_acyclic(self):
+        remaining = {name: set(deps) for name, deps in self.deps.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Cycle between nodes: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def reset(self):
+        self.status = {name: "pending" for name in self.nodes}
+        self.timings = {}
+        self.errors = {}
+        self.results = {}
+
+    def _invoke(self, node, kwargs, origin):
+        start = time.monotonic()
+        try:
+            result = node.fn(**kwargs) or {}
+            missing = [key for key in node.outputs if key not in result]
+            if missing:
+                raise ValueError(f"{node.name} did not return {missing}")
+            return result
+        finally:
+            self.timings[node.name] = (start - origin, time.monotonic() - origin)
+
+    def _set(self, name, status, on_event):
+        with self.lock:
+            self.status[name] = status
+        if on_event:
+            on_event(name, status, self)
+
+    def run(self, context, on_event=None):
+        """
+        Executes the graph and returns the final context (inputs + every node's outputs).
+        `on_event(name, status, executor)` is called in the caller's thread on every status change,
+        so it may safely draw Streamlit elements. A failed node skips everything downstream of it.
+        """
+        self.reset()
+        context = dict(context)
+        for node in self.nodes.values():
+            unknown = [key for key in node.inputs if key not in self.producers and key not in context]
+            if unknown:
+                raise ValueError(f"{node.name} needs {unknown}, which nothing provides")
+
+        origin = time.monotonic()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gpa-dag",
+                                initializer=self.initializer) as pool:
+            while True:
+                for name, node in self.nodes.items():
+                    if self.status[name] != "pending":
+                        continue
+                    dep_states = {self.status[dep] for dep in self.deps[name]}
+                    if dep_states & {"failed", "skipped"}:
+                        self._set(name, "skipped", on_event)
+                    elif dep_states <= {"done"}:
+                        kwargs = {key: context[key] for key in node.inputs}
+                        running[pool.submit(self._invoke, node, kwargs, origin)] = name
+                        self._set(name, "running", on_event)
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                        context.update(self.results[name])
+                        self._set(name, "done", on_event)
+                    except Exception as e:
+                        self.errors[name] = e
+                        self._set(name, "failed", on_event)
+        return context
+
+    def ancestors(self, name):
+        seen = set()
+        stack = list(self.deps[name])
+        while stack:
+            dep = stack.pop()
+            if dep not in seen:
+                seen.add(dep)
+                stack.extend(self.deps[dep])
+        return seen
+
+    def duration(self, name):
+        if name not in self.timings:
+            return None
+        start, end = self.timings[name]
+        return end - start
+
+    def summary(self):
+        """Per-node status and timing, in declaration order."""
+        return [
+            {
+                "node": name,
+                "status": self.status[name],
+                "start_s": round(self.timings[name][0], 3) if name in self.timings else None,
+                "duration_s": round(self.duration(name), 3) if name in self.timings else None,
+                "error": str(self.errors[name]) if name in self.errors else None,
+            }
+            for name in self.nodes
+        ]
+
+    def to_dot(self):
+        """Graphviz DOT of the live graph, coloured by status and labelled with durations."""
+        lines = ['digraph {', '    rankdir="LR";', '    start [label="Start", shape="oval"];']
+        end_color = "lightgreen" if all(s == "done" for s in self.status.values()) else "white"
+        lines.append(f'    end [label="End", shape="oval", style="filled", fillcolor="{end_color}"];')
+        for name, node in self.nodes.items():
+            status = self.status[name]
+            label = node.label
+            if self.duration(name) is not None:
+                label += f"\\n{self.duration(name):.2f}s"
+            elif status == "skipped":
+                label += "\\n(skipped)"
+            style = '"filled,dashed"' if status == "skipped" else '"filled"'
+            lines.append(f'    {name} [label="{label}", shape="box", style={style}, '
+                         f'fillcolor="{STATUS_COLORS[status]}"];')
+        children = {dep for deps in self.deps.values() for dep in deps}
+        for name, deps in self.deps.items():
+            if not deps:
+                lines.append(f"    start -> {name};")
+            # Draw only direct edges: skip deps already implied through another dep
+            implied = set().union(*(self.ancestors(dep) for dep in deps)) if deps else set()
+            for dep in sorted(deps - implied):
+                lines.append(f"    {dep} -> {name};")
+            if name not in children:
+                lines.append(f"    {name} -> end;")
+        lines.append("}")
+        return "\n".join(lines)
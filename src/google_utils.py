@@ -2,12 +2,11 @@ import os
 import json
 import base64
 import re  # Added for robust JSON parsing
+import threading
 from email.mime.text import MIMEText
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 import streamlit as st
+from rate_limiter import get_governor, parse_retry_after
+from traffic_recorder import ReplayHttp, get_cassette, is_replaying, wrap_http
 
 # Fixes Issue #9: Downgraded 'drive' to 'drive.file' for security and easier verification
 SCOPES = [
@@ -22,6 +21,11 @@ def get_google_creds():
     Retrieves Google Cloud credentials using a sustainable hierarchy.
     (Code from previous fix - no changes here)
     """
+    # Deferred imports: the google-auth / oauthlib stacks are only loaded on login
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
     creds = None
     try:
         if "google_oauth" in st.secrets:
@@ -65,23 +69,78 @@ def get_google_creds():
 
     return creds
 
-def get_google_service():
-    """Builds and returns the Google Workspace service objects."""
-    creds = get_google_creds()
-    if not creds: return None, None, None, None
+def _thread_local_http(creds):
+    """
+    httplib2.Http is not thread-safe, so a service shared across sessions must not share one
+    connection between threads. This request builder keeps one AuthorizedHttp per thread
+    (per credential), so requests from the same thread still reuse their TCP/TLS connection.
+    """
+    import httplib2
+    import google_auth_httplib2
+    from googleapiclient.http import HttpRequest
+
+    local = threading.local()
+
+    def build_request(http, *args, **kwargs):
+        if getattr(local, "http", None) is None:
+            local.http = wrap_http(google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http()))
+        return HttpRequest(local.http, *args, **kwargs)
+    return build_request
+
+def build_services(creds):
+    """
+    Builds the (gmail, drive, docs, slides) service objects for the given credentials.
+    In replay mode (GPA_TRAFFIC_MODE=replay) no credentials are needed: responses come from the cassette.
+    """
+    from googleapiclient.discovery import build
+
+    if is_replaying():
+        http = ReplayHttp(get_cassette())
+        return tuple(build(name, version, http=http) for name, version in
+                     (('gmail', 'v1'), ('drive', 'v3'), ('docs', 'v1'), ('slides', 'v1')))
+
+    request_builder = _thread_local_http(creds)
+    return (
+        build('gmail', 'v1', credentials=creds, requestBuilder=request_builder),
+        build('drive', 'v3', credentials=creds, requestBuilder=request_builder),
+        build('docs', 'v1', credentials=creds, requestBuilder=request_builder),
+        build('slides', 'v1', credentials=creds, requestBuilder=request_builder)
+    )
+
+def get_google_service(builder=build_services):
+    """
+    Builds and returns the Google Workspace service objects.
+    `builder` lets callers plug in a cached builder (see app_cache.get_services).
+    """
+    creds = None if is_replaying() else get_google_creds()
+    if not creds and not is_replaying(): return None, None, None, None
     try:
-        return (
-            build('gmail', 'v1', credentials=creds),
-            build('drive', 'v3', credentials=creds),
-            build('docs', 'v1', credentials=creds),
-            build('slides', 'v1', credentials=creds) 
-        )
+        return builder(creds)
     except Exception as e:
         st.error(f"❌ Failed to connect to Google Services: {e}")
         return None, None, None, None
 
+def execute_throttled(api_name, request):
+    """
+    Executes a googleapiclient request through the shared governor for `api_name`.
+    On 429 / rate-limit errors the governor backs off all callers before re-raising.
+    """
+    governor = get_governor(api_name)
+    with governor.slot():
+        try:
+            return request.execute()
+        except Exception as e:
+            resp = getattr(e, 'resp', None)
+            status = getattr(resp, 'status', None)
+            if status == 429 or (status == 403 and 'rateLimitExceeded' in str(e)):
+                governor.penalize(parse_retry_after(resp.get('retry-after')))
+            raise
+
 def create_doc_with_content(service_docs, service_drive, title, content):
-    """建立 Google Doc 並寫入 LLM 產生的內容"""
+    """
+    建立 Google Doc 並寫入 LLM 產生的內容
+    Returns (doc_id, url), or (None, error message) on failure. No st.* calls: this runs on pipeline worker threads.
+    """
     try:
         doc = service_docs.documents().create(body={'title': title}).execute()
         doc_id = doc.get('documentId')
@@ -90,30 +149,33 @@ def create_doc_with_content(service_docs, service_drive, title, content):
         file_info = service_drive.files().get(fileId=doc_id, fields='webViewLink').execute()
         return doc_id, file_info.get('webViewLink')
     except Exception as e:
-        st.error(f"建立文件失敗: {e}")
-        return None, None
+        return None, f"建立文件失敗: {e}"
 
 def create_slides_presentation(service_slides, service_drive, title, json_content):
     """
     Create Google Slides with robust JSON parsing.
     Fixes Issue #10: Uses Regex to extract JSON array from messy LLM output.
+    `json_content` may also be an already-validated slide list (see llm_helper.generate_slides_outline).
     """
     slides_data = []
-    try:
-        # 🟢 Robust Parsing Logic (Fixes Issue #10)
-        # 1. Try to find a JSON array pattern [ ... ]
-        match = re.search(r'\[.*\]', json_content, re.DOTALL)
-        
-        if match:
-            json_str = match.group(0)
-            slides_data = json.loads(json_str)
-        else:
-            # Fallback: Try cleaning just the markdown tags if regex fails
-            clean_json = json_content.replace("```json", "").replace("```", "").strip()
-            slides_data = json.loads(clean_json)
+    if isinstance(json_content, list):
+        slides_data = json_content
+    else:
+        try:
+            # 🟢 Robust Parsing Logic (Fixes Issue #10)
+            # 1. Try to find a JSON array pattern [ ... ]
+            match = re.search(r'\[.*\]', json_content, re.DOTALL)
             
-    except json.JSONDecodeError as e:
-        return None, f"❌ JSON Parsing Failed: {str(e)} \n(Content: {json_content[:100]}...)"
+            if match:
+                json_str = match.group(0)
+                slides_data = json.loads(json_str)
+            else:
+                # Fallback: Try cleaning just the markdown tags if regex fails
+                clean_json = json_content.replace("```json", "").replace("```", "").strip()
+                slides_data = json.loads(clean_json)
+                
+        except json.JSONDecodeError as e:
+            return None, f"❌ JSON Parsing Failed: {str(e)} \n(Content: {json_content[:100]}...)"
 
     try:
         # B. 建立簡報 (Create Presentation)
@@ -145,7 +207,7 @@ def create_slides_presentation(service_slides, service_drive, title, json_conten
                 })
                 
                 slide_title = slide.get('title', title)
-                slide_subtitle = slide.get('subtitle', slide.get('points', ''))
+                slide_subtitle = slide.get('subtitle') or slide.get('points', '')
                 
                 if slide_title:
                     requests.append({'insertText': {'objectId': title_id, 'text': slide_title}})
@@ -205,18 +267,20 @@ def create_slides_presentation(service_slides, service_drive, title, json_conten
         return None, str(e)
 
 def share_file_permissions(service_drive, file_id, emails):
-    """Share file permissions (Writer)"""
+    """Share file permissions (Writer). Returns the failed (email, error) pairs for the caller to display."""
+    failed_list = []
     for email in emails:
         user_permission = {'type': 'user', 'role': 'writer', 'emailAddress': email.strip()}
         try:
-            service_drive.permissions().create(
+            execute_throttled('drive', service_drive.permissions().create(
                 fileId=file_id,
                 body=user_permission,
                 fields='id',
                 sendNotificationEmail=False
-            ).execute()
+            ))
         except Exception as e:
-            st.warning(f"⚠️ Unable to share with {email}: {e}")
+            failed_list.append((email, str(e)))
+    return failed_list
 
 def send_gmail(service_gmail, to_emails, subject, content):
     """Send Email to members"""
@@ -229,7 +293,7 @@ def send_gmail(service_gmail, to_emails, subject, content):
             message['subject'] = subject
             raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
             body = {'raw': raw}
-            service_gmail.users().messages().send(userId='me', body=body).execute()
+            execute_throttled('gmail', service_gmail.users().messages().send(userId='me', body=body))
             success_list.append(email)
         except Exception as e:
             failed_list.append((email, str(e)))
@@ -1,36 +1,25 @@
-import os
 import json
 import time  # Added for retry delay
-import requests
-from dotenv import load_dotenv
-from pathlib import Path
 from custom_exceptions import LLMGenerationError
+from config import get_settings
+from rate_limiter import get_governor, parse_retry_after
+from traffic_recorder import CassetteMissError, http_post
+from prompt_builder import PAGE_BREAK, REPAIR_TEMPLATE, build_prompt, estimate_tokens
+from slide_schema import SLIDES_SCHEMA, merge_repaired, parse_slides, to_gemini_schema, validate_slides
 
-# 1. Load .env
-current_dir = Path(__file__).parent
-env_path = current_dir.parent / '.env'
-load_dotenv(dotenv_path=env_path, override=True)
-
-def generate_project_plan(course_name, members, assignment_text, current_date, due_date, output_format="Docs", retries=3):
+def _provider_request(prompt, response_schema=None):
     """
-    Calls LLM API to generate project plan with automatic retries.
-    Raises: LLMGenerationError on failure after all retries.
+    Builds (api_url, headers, payload) for the configured provider.
+    With `response_schema`, asks the provider for native structured JSON output.
     """
-    
-    # --- Configuration ---
-    provider = os.getenv("LLM_PROVIDER", "ncku").lower()
-    api_key = os.getenv("API_KEY", "")
-    
-    default_models = {
-        "openai": "gpt-4o",
-        "gemini": "gemini-1.5-flash",
-        "ollama": "llama3",
-        "ncku": "gpt-oss:120b"
-    }
-    model_name = os.getenv("MODEL_NAME", default_models.get(provider, "gpt-4o"))
+    # --- Configuration (parsed once, see config.get_settings) ---
+    settings = get_settings()
+    provider = settings.llm_provider
+    api_key = settings.api_key
+    model_name = settings.model_name
     
     # --- API URL & Headers Setup ---
-    api_url = os.getenv("API_URL", "")
+    api_url = settings.api_url
     headers = {"Content-Type": "application/json"}
     
     if provider == "openai":
@@ -47,72 +36,27 @@ def generate_project_plan(course_name, members, assignment_text, current_date, d
         if not api_url: api_url = "https://api-gateway.netdb.csie.ncku.edu.tw/api/chat"
         headers["Authorization"] = f"Bearer {api_key}"
 
-    # --- Prompt Construction ---
-    if output_format == "Slides":
-            # (JSON Prompt - Unchanged)
-            prompt = f"""
-            You are a Project Manager.
-            [Course]: {course_name}
-            [Members]: {members}
-            [Assignment]: {assignment_text}
-            [Date]: Today is {current_date}, Due is {due_date}.
-            
-            Please generate a "Google Slides Outline" for this project.
-            
-            【STRICT FORMAT REQUIREMENTS】:
-            1. Output a valid JSON Array.
-            2. **First Slide (Cover)** must contain "title" (Main Title) and "subtitle" (Members).
-            3. **Subsequent Slides** must contain "title" and "points" (Bullet points, separated by \\n).
-            4. Do NOT use Markdown formatting (no ```json). Just raw JSON.
-            5. Minimum 7 slides.
-
-            【Example Format】:
-            [
-                {{"title": "{course_name} Final Project: [Topic]", "subtitle": "Members: {members}\\nDate: {current_date}"}},
-                {{"title": "Project Goals", "points": "1. Goal A\\n2. Goal B"}},
-                {{"title": "Task Allocation", "points": "• Alice: Frontend\\n• Bob: Backend"}}
-            ]
-            """
-    else:
-        # (Docs Prompt - Unchanged)
-        prompt = f"""
-        You are a professional Project Manager.
-        [Course]: {course_name}
-        [Members]: {members}
-        [Assignment]: {assignment_text}
-        [Date]: Today is {current_date}, Due is {due_date}.
-
-        Please generate a comprehensive project proposal.
-
-        【STRICT FORMAT - NO MARKDOWN TABLES】:
-        1. **Plain Text Only**.
-        2. **Do NOT use '|' characters**. Do NOT use Markdown tables.
-        3. Use [Brackets] for headers.
-        4. Task Allocation Format: "- [Task Name]: [Owner] (Deliverable: [Item])"
-
-        【Example Output】:
-        [1. Project Goal]
-        The goal is to develop...
-
-        [2. Tasks]
-        - Crawler Dev: Alice (Deliverable: Python script)
-        - Backend: Bob (Deliverable: API Docs)
-
-        [3. Schedule]
-        - 12/20: Arch Review
-        """
-
     # --- Payload Construction ---
     payload = {}
     
     if provider == "gemini":
         payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        if response_schema:
+            payload["generationConfig"] = {
+                "responseMimeType": "application/json",
+                "responseSchema": to_gemini_schema(response_schema)
+            }
     elif provider == "openai":
         payload = {
             "model": model_name,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.7
         }
+        if response_schema:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "slides_outline", "schema": response_schema, "strict": True}
+            }
     else: # ollama, ncku
         payload = {
             "model": model_name,
@@ -120,9 +64,24 @@ def generate_project_plan(course_name, members, assignment_text, current_date, d
             "stream": False,
             "options": {"temperature": 0.7}
         }
+        if response_schema:
+            payload["format"] = response_schema
+
+    return provider, api_url, headers, payload
+
+def call_llm(prompt, retries=3, response_schema=None, governor_name="llm"):
+    """
+    Sends one prompt to the configured provider with automatic retries and returns the raw text.
+    `governor_name` selects the rate limiter ("llm_speculative" for background prefetch calls).
+    Raises: LLMGenerationError on failure after all retries.
+    """
+    import requests  # Deferred: only needed once a generation actually runs
+
+    provider, api_url, headers, payload = _provider_request(prompt, response_schema)
 
     # 🟢 RETRY LOOP LOGIC (Fixes Issue #11)
     print(f"🚀 Sending request to {provider.upper()} (Max Retries: {retries})...")
+    governor = get_governor(governor_name)
 
     for attempt in range(retries):
         try:
@@ -130,8 +89,15 @@ def generate_project_plan(course_name, members, assignment_text, current_date, d
             if attempt > 0:
                 print(f"🔄 Retry Attempt {attempt + 1}/{retries}...")
 
-            response = requests.post(api_url, headers=headers, json=payload, timeout=(10, 300))
-            
+            # 🟢 Shared rate limiter: waits for a token + concurrency slot before calling
+            with governor.slot():
+                response = http_post(api_url, headers=headers, json=payload, timeout=(10, 300))
+
+            if response.status_code == 429:
+                # Back off every caller instead of letting each retry hammer the quota
+                governor.penalize(parse_retry_after(response.headers.get("Retry-After")))
+                raise LLMGenerationError(f"API Rate Limited (429): {response.text}")
+
             if response.status_code != 200:
                 raise LLMGenerationError(f"API Error ({response.status_code}): {response.text}")
 
@@ -158,12 +124,11 @@ def generate_project_plan(course_name, members, assignment_text, current_date, d
             if not content:
                 raise LLMGenerationError(f"Unknown response format: {result_json.keys()}")
                 
-            # --- Cleaning ---
-            clean_content = content.replace("**", "").replace("##", "").replace("###", "")
-            clean_content = clean_content.replace("|---|", "").replace("|", "  ")
-            
-            return clean_content
+            return content
 
+        except CassetteMissError:
+            # Replay mismatch: retrying cannot help, surface it as-is
+            raise
         except (requests.exceptions.Timeout, LLMGenerationError, Exception) as e:
             # If this is the last attempt, re-raise the exception to main.py
             if attempt == retries - 1:
@@ -177,13 +142,99 @@ def generate_project_plan(course_name, members, assignment_text, current_date, d
             print(f"⚠️ Attempt {attempt + 1} failed: {e}. Retrying in 2 seconds...")
             time.sleep(2)
 
-def extract_text_from_pdf(pdf_file):
+def generate_project_plan(course_name, members, assignment_text, current_date, due_date, output_format="Docs", retries=3, prompt=None, governor_name="llm"):
+    """
+    Calls LLM API to generate project plan with automatic retries.
+    Pass a pre-rendered `prompt` (e.g. from app_cache.render_prompt) to skip rebuilding it.
+    Raises: LLMGenerationError on failure after all retries.
+    """
+    # --- Prompt Construction ---
+    if prompt is None:
+        prompt = build_prompt(course_name, members, assignment_text, current_date, due_date, output_format)
+    print(f"📏 Prompt size: {len(prompt)} chars ≈ {estimate_tokens(prompt)} tokens")
+
+    content = call_llm(prompt, retries=retries, governor_name=governor_name)
+
+    # --- Cleaning ---
+    clean_content = content.replace("**", "").replace("##", "").replace("###", "")
+    clean_content = clean_content.replace("|---|", "").replace("|", "  ")
+    
+    return clean_content
+
+def _repair_slides(slides, broken, course_name, retries):
+    """Regenerates only the broken slides, using the valid neighbours as context."""
+    outline = "\n".join(
+        f"{i + 1}. {slide['title'] if slide else '<MISSING>'}" for i, slide in enumerate(slides)
+    )
+    positions = ", ".join(str(i + 1) for i in broken)
+    prompt = REPAIR_TEMPLATE.substitute(course_name=course_name, outline=outline,
+                                        positions=positions, count=len(broken))
+    print(f"🩹 Regenerating {len(broken)} broken slide(s): {positions}")
+    candidates = parse_slides(call_llm(prompt, retries=retries, response_schema=SLIDES_SCHEMA)) or []
+    # Validate against the real positions: only slide 1 (the cover) may come back without points
+    repaired, _ = validate_slides(candidates[:len(broken)], positions=broken)
+    return repaired + [None] * (len(broken) - len(repaired))
+
+def generate_slides_outline(course_name, members, assignment_text, current_date, due_date, retries=3, prompt=None):
+    """
+    Generates the Slides outline as validated structured data (list of {title, subtitle, points}).
+    Uses provider-native JSON output; when some slides fail validation only those are regenerated.
+    Raises: LLMGenerationError when no valid outline can be produced.
+    """
+    if prompt is None:
+        prompt = build_prompt(course_name, members, assignment_text, current_date, due_date, "Slides")
+    print(f"📏 Prompt size: {len(prompt)} chars ≈ {estimate_tokens(prompt)} tokens")
+
+    # A full re-generation only happens if nothing usable came back (no JSON, or no valid slide at all)
+    error = None
+    for attempt in range(2):
+        candidates = parse_slides(call_llm(prompt, retries=retries, response_schema=SLIDES_SCHEMA))
+        if not candidates:
+            error = "Slides outline is not valid JSON after regeneration"
+            print(f"⚠️ Slides output was not valid JSON (attempt {attempt + 1}/2)")
+            continue
+        slides, broken = validate_slides(candidates)
+        if len(broken) < len(slides):
+            break
+        error = "No slide in the generated outline matches the schema"
+        print(f"⚠️ No valid slide in the outline (attempt {attempt + 1}/2)")
+    else:
+        raise LLMGenerationError(error)
+
+    if broken:
+        try:
+            replacements = _repair_slides(slides, broken, course_name, retries)
+        except LLMGenerationError as e:
+            print(f"⚠️ Slide repair failed, keeping the valid slides: {e.message}")
+            replacements = [None] * len(broken)
+        slides = merge_repaired(slides, broken, replacements)
+    return slides
+
+def extract_text_from_pdf(pdf_file, max_chars=None):
+    """
+    Extracts text page by page (pages separated by form feeds).
+    Memory-bounded: at most `max_chars` characters are kept (default: settings.max_assignment_chars)
+    and only a few parses run at once across all sessions (the "pdf" governor).
+    """
     import pypdf
+    settings = get_settings()
+    if max_chars is None:
+        max_chars = settings.max_assignment_chars
     try:
-        pdf_reader = pypdf.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        with get_governor("pdf").slot():
+            pdf_reader = pypdf.PdfReader(pdf_file)
+            parts = []
+            total = 0
+            page_count = len(pdf_reader.pages)
+            for index, page in enumerate(pdf_reader.pages):
+                # Form feed marks page boundaries so prompt_builder can spot repeated headers/footers
+                page_text = (page.extract_text() or "") + "\n" + PAGE_BREAK
+                if total + len(page_text) > max_chars:
+                    parts.append(page_text[:max(0, max_chars - total)])
+                    parts.append(f"\n[... truncated: read {index + 1} of {page_count} pages ...]\n")
+                    break
+                parts.append(page_text)
+                total += len(page_text)
+            return "".join(parts)
     except Exception as e:
         return f"Error reading PDF: {e}"
@@ -2,29 +2,27 @@ import streamlit as st
 import time
 import datetime
 import re
-import os
+from functools import lru_cache
+from config import get_settings
 from custom_exceptions import LLMGenerationError  # Import Exception
-from google_utils import get_google_service, create_doc_with_content, create_slides_presentation, share_file_permissions, send_gmail
-from llm_helper import extract_text_from_pdf, generate_project_plan
+from agent_pipeline import build_agent_pipeline
+from app_cache import get_services, get_pdf_text, normalize_recipients, pdf_fingerprint, render_prompt, render_cache_admin
+from prefetch import docs_key, get_prefetcher, speculate
+from memory_guard import track_memory
+from rate_limiter import governor_stats
 
 # --- Page Setup ---
 st.set_page_config(page_title="Course Agent", page_icon="🤖", layout="wide")
 
+# --- Form defaults ---
+DEFAULT_COURSE = "計算理論"
+DEFAULT_MEMBERS = "f74122030, joshuatseng0233@gmail.com"
+
 # --- DAG Drawing ---
+@lru_cache(maxsize=1)
 def draw_dag():
-    return """
-    digraph {
-        rankdir="LR";
-        A [label="Start", shape="oval"];
-        B [label="LLM Analysis", shape="box", style="filled", fillcolor="lightblue"];
-        C1 [label="Create Doc", shape="box", style="filled", fillcolor="lightyellow"];
-        C2 [label="Create Slide", shape="box", style="filled", fillcolor="lightyellow"];
-        D [label="Set Permissions", shape="box", style="filled", fillcolor="lightyellow"];
-        E [label="Send Email", shape="box", style="filled", fillcolor="lightyellow"];
-        F [label="End", shape="oval", style="filled", fillcolor="lightgreen"];
-        A -> B; B -> C1; B -> C2; C1 -> D; C2 -> D; D -> E; E -> F;
-    }
-    """
+    """Structure of the real agent graph (both formats), before anything has run."""
+    return build_agent_pipeline((None, None, None, None), use_docs=True, use_slides=True).to_dot()
 
 # --- Main Program ---
 def main():
@@ -40,7 +38,7 @@ def main():
 
         if st.button("🔑 登入 Google"):
             try:
-                gmail, drive, docs, slides = get_google_service()
+                gmail, drive, docs, slides = get_services()
                 if gmail:
                     st.session_state.services = (gmail, drive, docs, slides)
                     st.success("登入成功！")
@@ -52,16 +50,35 @@ def main():
         
         st.divider()
         st.markdown("**System Logic (DAG)**")
-        st.graphviz_chart(draw_dag())
+        # Last executed graph with per-stage status and durations, else the static structure
+        st.graphviz_chart(st.session_state.get("last_dag") or draw_dag())
+
+        with st.expander("📈 API 節流狀態 (Rate Limiter)"):
+            stats = governor_stats()
+            if stats:
+                st.json(stats)
+            else:
+                st.caption("尚未呼叫任何外部 API")
+
+        render_cache_admin()
+
+        st.divider()
+        # Opt-in: start PDF parsing + Docs generation before the form is submitted
+        speculative = st.toggle("⚡ 預先處理 (Speculative Prefetch)", value=get_settings().speculative_prefetch,
+                                help="上傳 PDF 後立即在背景解析並預先產生企劃書；送出時若輸入相同則直接使用結果。")
 
     col1, col2 = st.columns([1, 1])
 
     with col1:
         st.subheader("1️⃣ 輸入專案資訊")
-        with st.form("project_input"):
-            course_name = st.text_input("課程名稱", "計算理論")
-            raw_ids = st.text_area("組員學號或 Email (用逗號分隔)", "f74122030, joshuatseng0233@gmail.com")
-            uploaded_file = st.file_uploader("上傳作業說明 (PDF)", type="pdf")
+        # Widgets inside st.form only report values on submit, so speculative mode uses a plain container
+        with (st.container(border=True) if speculative else st.form("project_input")):
+            course_name = st.text_input("課程名稱", DEFAULT_COURSE)
+            raw_ids = st.text_area("組員學號或 Email (用逗號分隔)", DEFAULT_MEMBERS)
+            max_upload_mb = get_settings().max_upload_mb
+            # Streamlit holds every upload fully in RAM, so the size cap is the real memory bound
+            uploaded_file = st.file_uploader("上傳作業說明 (PDF)", type="pdf", max_upload_size=max_upload_mb,
+                                             help=f"上限 {max_upload_mb} MB")
             default_deadline = datetime.date.today() + datetime.timedelta(days=14)
             deadline = st.date_input("📅 報告截止日期", default_deadline)
             
@@ -69,7 +86,27 @@ def main():
             use_docs = st.checkbox("Google Docs (企劃書)", value=True)
             use_slides = st.checkbox("Google Slides (簡報)", value=False)
             
-            submitted = st.form_submit_button("🚀 啟動 Agent")
+            if speculative:
+                submitted = st.button("🚀 啟動 Agent", type="primary")
+            else:
+                submitted = st.form_submit_button("🚀 啟動 Agent")
+
+        # Re-check on the server before anything parses the bytes
+        if uploaded_file and uploaded_file.size > max_upload_mb * 1024 * 1024:
+            st.error(f"❌ PDF 超過 {max_upload_mb} MB 上限 ({uploaded_file.size / (1024 * 1024):.1f} MB)")
+            uploaded_file = None
+
+        today_str = str(datetime.date.today())
+        deadline_str = str(deadline)
+        # Hashing the upload is only needed to key speculative jobs
+        pdf_hash = pdf_fingerprint(uploaded_file.getvalue()) if speculative and uploaded_file else None
+
+        if speculative and uploaded_file:
+            # No speculative Docs call (and LLM quota) until the user has filled in both course and members
+            edited = course_name != DEFAULT_COURSE and raw_ids != DEFAULT_MEMBERS
+            jobs = speculate(uploaded_file.getvalue(), pdf_hash, course_name, raw_ids, today_str, deadline_str,
+                             use_docs and edited)
+            st.caption("⚡ 背景預先處理: " + ", ".join(f"{slot} ({state})" for slot, state in jobs.items()))
 
     with col2:
         st.subheader("2️⃣ Agent 執行日誌")
@@ -88,120 +125,108 @@ def main():
 
         gmail_svc, drive_svc, docs_svc, slides_svc = st.session_state.services
         
-        student_ids_list = [s.strip() for s in raw_ids.split(',') if s.strip()]
-        default_domain = os.getenv("DEFAULT_EMAIL_DOMAIN", "gs.ncku.edu.tw")
-        emails = [f"{sid}@{default_domain}" if "@" not in sid else sid for sid in student_ids_list]
+        emails = normalize_recipients(raw_ids, get_settings().default_email_domain)
         
-        today_str = str(datetime.date.today())
-        deadline_str = str(deadline)
-        is_success = True
+        prefetcher = get_prefetcher() if speculative else None
 
-        with log_container:
-            st.write("📂 讀取 PDF 中...")
-            pdf_text = extract_text_from_pdf(uploaded_file)
-            if not pdf_text:
-                st.error("❌ 無法讀取 PDF 內容")
-                st.stop()
-            st.success(f"✅ PDF 讀取完成 ({len(pdf_text)} 字)")
-
-        doc_url = None
-        slide_url = None
-
-        # --- 2. Google Docs ---
-        if use_docs:
+        # Peak memory of the whole run: PDF text, prompts, request bodies and Google calls
+        with track_memory() as memory:
             with log_container:
-                st.info("📝 正在處理 Google Docs 任務...")
-                with st.spinner("🤖 AI 正在撰寫企劃書..."):
-                    try:
-                        # 🟢 Try Block for Error Handling
-                        plan_docs = generate_project_plan(course_name, raw_ids, pdf_text, today_str, deadline_str, "Docs")
-                        
-                        doc_title = f"[{course_name}] 期末報告企劃書"
-                        doc_id, doc_url = create_doc_with_content(docs_svc, drive_svc, doc_title, plan_docs)
-                        
-                        if doc_url:
-                            st.success(f"✅ 企劃書建立成功: [點擊開啟]({doc_url})")
-                            share_file_permissions(drive_svc, doc_id, emails)
-                        else:
-                            st.error("❌ 企劃書建立失敗 (API 回傳空值)")
-                            is_success = False
-
-                    except LLMGenerationError as e:
-                        # 🟢 Catch Custom Exception
-                        st.error(f"❌ Docs 生成失敗: {e.message}")
-                        is_success = False
-                    except Exception as e:
-                        st.error(f"❌ 企劃書建立過程發生錯誤: {e}")
-                        is_success = False
-
-        # --- 3. Google Slides ---
-        if use_slides:
+                st.write("📂 讀取 PDF 中...")
+                pdf_text = prefetcher.take("pdf", pdf_hash) if prefetcher else None
+                if pdf_text is None:
+                    pdf_text = get_pdf_text(uploaded_file)
+                if not pdf_text:
+                    st.error("❌ 無法讀取 PDF 內容")
+                    st.stop()
+                st.success(f"✅ PDF 讀取完成 ({len(pdf_text)} 字)")
+
+            # --- 2. Run the agent graph (Docs / Slides branches in parallel) ---
+            take_prefetched_docs = None
+            if prefetcher and use_docs:
+                docs_job = docs_key(course_name, raw_ids, pdf_hash, today_str, deadline_str)
+                take_prefetched_docs = lambda: prefetcher.take("docs", docs_job)
+
+            pipeline = build_agent_pipeline(
+                (gmail_svc, drive_svc, docs_svc, slides_svc),
+                use_docs=use_docs,
+                use_slides=use_slides,
+                prompt_renderer=render_prompt,
+                take_prefetched_docs=take_prefetched_docs,
+            )
+
             with log_container:
-                st.info("📊 正在處理 Google Slides 任務...")
-                with st.spinner("🤖 AI 正在規劃簡報架構..."):
-                    try:
-                        # 🟢 Try Block for Error Handling
-                        plan_slides = generate_project_plan(course_name, raw_ids, pdf_text, today_str, deadline_str, "Slides")
-                        
-                        slide_title = f"[{course_name}] 期末報告簡報"
-                        slide_id, slide_url = create_slides_presentation(slides_svc, drive_svc, slide_title, plan_slides)
-                        
-                        if slide_url:
-                            st.success(f"✅ 簡報建立成功: [點擊開啟]({slide_url})")
-                            share_file_permissions(drive_svc, slide_id, emails)
-                        else:
-                            # Note: create_slides_presentation still returns None on error
-                            # Ideally, we should refactor that too, but keeping it simple for now.
-                            st.error("❌ 簡報建立失敗 (JSON 解析錯誤或 API 權限問題)")
-                            is_success = False
-                            
-                    except LLMGenerationError as e:
-                        # 🟢 Catch Custom Exception
-                        st.error(f"❌ Slides 生成失敗: {e.message}")
-                        is_success = False
-                    except Exception as e:
-                        st.error(f"❌ 簡報建立過程發生錯誤: {e}")
-                        is_success = False
-
-        # --- 4. Send Email ---
+                st.info("🤖 Agent 執行中 (Docs / Slides 平行處理)...")
+                live_chart = st.empty()
+                live_chart.graphviz_chart(pipeline.to_dot())
+
+            def on_event(name, status, executor):
+                live_chart.graphviz_chart(executor.to_dot())
+                with log_container:
+                    report_stage(name, status, executor)
+
+            context = {
+                "course_name": course_name,
+                "members": raw_ids,
+                "pdf_text": pdf_text,
+                "today": today_str,
+                "deadline": deadline_str,
+                "emails": emails,
+            }
+            results = pipeline.run(context, on_event=on_event)
+        st.session_state.last_dag = pipeline.to_dot()
+
         with log_container:
-            if not is_success:
+            with st.expander("⏱️ 各階段耗時 (DAG timings)"):
+                st.table(pipeline.summary())
+            if memory:
+                st.caption("🧠 Memory: " + ", ".join(f"{k}={v}" for k, v in memory.items()))
+            if pipeline.errors:
                 st.error("⛔️ 由於部分檔案生成失敗，系統已終止，不會發送 Email 以免誤導組員。")
-                st.stop()
-
-            st.write("📧 正在寄信通知組員...")
-            subject = f"[{course_name}] 期末報告分工通知 (AI Agent)"
-            
-            links_text = ""
-            if doc_url: links_text += f"📄 企劃書連結：{doc_url}\n"
-            if slide_url: links_text += f"📊 簡報連結：{slide_url}\n"
-
-            email_body = f"""
-            各位同學好：
-            
-            這是一封由 AI Agent 自動發送的通知。
-            針對 {course_name} 的期末報告，我已經根據作業 PDF 產生了初步架構。
-            
-            請大家到以下連結開始協作：
-            {links_text}
-            
-            祝 報告順利！
-            """
-            
-            try:
-                success_emails, failed_emails = send_gmail(gmail_svc, emails, subject, email_body)
-                if success_emails:
-                    st.success(f"✅ Email 發送成功 ({len(success_emails)} 人)：\n" + ", ".join(success_emails))
-                if failed_emails:
-                    st.error(f"⚠️ 發送失敗 ({len(failed_emails)} 人)：")
-                    for email, error_msg in failed_emails:
-                        st.write(f"❌ **{email}** → {error_msg}")
-                if success_emails:
-                    st.balloons()
-                    st.success("🏆 所有流程執行完畢！")
-
-            except Exception as e:
-                 st.error(f"⚠️ 寄信功能發生系統錯誤: {e}")
+            elif results.get("emails_sent"):
+                st.balloons()
+                st.success("🏆 所有流程執行完畢！")
+
+def report_stage(name, status, executor):
+    """Writes one stage's outcome, including problems it returned (called in the script thread, never from workers)."""
+    if status == "failed":
+        error = executor.errors[name]
+        if isinstance(error, LLMGenerationError):
+            kind = "Slides" if name == "llm_slides" else "Docs"
+            st.error(f"❌ {kind} 生成失敗: {error.message}")
+        else:
+            st.error(f"❌ {executor.nodes[name].label} 失敗: {error}")
+        return
+    if status != "done":
+        return
+
+    output = executor.results[name]
+    duration = f"({executor.duration(name):.1f}s)"
+    if name == "llm_docs":
+        if output.get("docs_prefetched"):
+            st.caption("⚡ 使用預先產生的企劃書")
+        else:
+            st.caption(f"📝 企劃書內容已產生 {duration} · 📏 Prompt ≈ {output['docs_prompt_tokens']} tokens")
+    elif name == "llm_slides":
+        st.caption(f"📊 簡報架構已產生 {duration} · 📏 Prompt ≈ {output['slides_prompt_tokens']} tokens")
+    elif name == "create_doc":
+        st.success(f"✅ 企劃書建立成功: [點擊開啟]({output['doc_url']}) {duration}")
+    elif name == "create_slides":
+        st.success(f"✅ 簡報建立成功: [點擊開啟]({output['slide_url']}) {duration}")
+    elif name in ("share_doc", "share_slides"):
+        st.write(f"🔐 {executor.nodes[name].label}: 已設定組員編輯權限 {duration}")
+        failed = output["doc_share_failed" if name == "share_doc" else "slides_share_failed"]
+        for email, error_msg in failed:
+            st.warning(f"⚠️ Unable to share with {email}: {error_msg}")
+    elif name == "send_email":
+        success_emails = output["emails_sent"]
+        failed_emails = output["emails_failed"]
+        if success_emails:
+            st.success(f"✅ Email 發送成功 ({len(success_emails)} 人)：\n" + ", ".join(success_emails))
+        if failed_emails:
+            st.error(f"⚠️ 發送失敗 ({len(failed_emails)} 人)：")
+            for email, error_msg in failed_emails:
+                st.write(f"❌ **{email}** → {error_msg}")
 
 if __name__ == "__main__":
     main()
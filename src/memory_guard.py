@@ -0,0 +1,128 @@
+import os
+import json
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# 🟢 Memory bounds for uploads and LLM payloads
+# - uploads above MAX_UPLOAD_MB are rejected before they are parsed (see main.py)
+# - request bodies are JSON-encoded incrementally instead of building one big string
+# - track_memory() samples RSS during a whole run and reports its peak
+JSON_CHUNK_CHARS = 64 * 1024
+RSS_SAMPLE_SECONDS = 0.01
+
+
+class JsonBodyStream:
+    """
+    Iterable request body that encodes `payload` chunk by chunk.
+    __len__ lets requests send a Content-Length instead of chunked transfer encoding;
+    computing it walks the encoder once more but never holds the whole body in memory.
+    """
+
+    def __init__(self, payload):
+        self.payload = payload
+        self._length = None
+
+    def _pieces(self, value):
+        # json's own iterencode emits every string in one piece, and the prompt is one huge
+        # string, so strings are escaped slice by slice here.
+        if isinstance(value, str):
+            yield '"'
+            for start in range(0, len(value), JSON_CHUNK_CHARS):
+                yield json.dumps(value[start:start + JSON_CHUNK_CHARS], ensure_ascii=False)[1:-1]
+            yield '"'
+        elif isinstance(value, dict):
+            yield "{"
+            for index, (key, item) in enumerate(value.items()):
+                yield (", " if index else "") + json.dumps(str(key), ensure_ascii=False) + ": "
+                yield from self._pieces(item)
+            yield "}"
+        elif isinstance(value, (list, tuple)):
+            yield "["
+            for index, item in enumerate(value):
+                if index:
+                    yield ", "
+                yield from self._pieces(item)
+            yield "]"
+        else:
+            yield json.dumps(value)
+
+    def _chunks(self):
+        buffer = []
+        size = 0
+        for piece in self._pieces(self.payload):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= JSON_CHUNK_CHARS:
+                yield "".join(buffer).encode("utf-8")
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer).encode("utf-8")
+
+    def __iter__(self):
+        return self._chunks()
+
+    def __len__(self):
+        if self._length is None:
+            self._length = sum(len(chunk) for chunk in self._chunks())
+        return self._length
+
+    def read_all(self):
+        """Whole body as bytes (tests / debugging only)."""
+        return b"".join(self._chunks())
+
+
+def current_rss_mb():
+    """Current resident set size in MB (not the lifetime high-water mark). None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+@contextmanager
+def track_memory(interval=RSS_SAMPLE_SECONDS):
+    """
+    Measures one block (e.g. a whole agent run). Yields a dict filled on exit with:
+    - rss_before_mb / rss_peak_mb / rss_after_mb: process RSS, the peak sampled every `interval` seconds
+      by a background thread (RSS is process-wide, so concurrent sessions are included)
+    - rss_peak_delta_mb: how far the peak rose above the starting RSS
+    - python_peak_mb: peak Python heap growth during the block (only if tracemalloc is tracing,
+      e.g. PYTHONTRACEMALLOC=1, because tracing slows everything down)
+    """
+    report = {}
+    before = current_rss_mb()
+    peak = [before]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(interval):
+            rss = current_rss_mb()
+            if rss > peak[0]:
+                peak[0] = rss
+
+    sampler = None
+    if before is not None:
+        sampler = threading.Thread(target=sample, name="gpa-rss-sampler", daemon=True)
+        sampler.start()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    try:
+        yield report
+    finally:
+        if tracing:
+            _, python_peak = tracemalloc.get_traced_memory()
+            report["python_peak_mb"] = round(max(0, python_peak - baseline) / (1024 * 1024), 2)
+        if sampler is not None:
+            stop.set()
+            sampler.join()
+            after = current_rss_mb()
+            peak[0] = max(peak[0], after)
+            report["rss_before_mb"] = round(before, 1)
+            report["rss_peak_mb"] = round(peak[0], 1)
+            report["rss_after_mb"] = round(after, 1)
+            report["rss_peak_delta_mb"] = round(peak[0] - before, 1)
@@ -0,0 +1,126 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from app_cache import pdf_text_for_bytes
+from llm_helper import generate_project_plan
+from prompt_builder import build_prompt
+
+# 🟢 Speculative prefetch (opt-in)
+# While the user is still filling in the form, PDF extraction and the Docs generation
+# start in the background. On submit the result is used only if the inputs still match;
+# otherwise it is discarded and the normal path runs.
+PREFETCH_WORKERS = 4
+# Inputs must stay unchanged this long before a speculative Docs generation is sent
+SPECULATION_IDLE_SECONDS = 3
+
+
+@st.cache_resource(show_spinner=False)
+def _executor():
+    # One pool for the whole process; the "llm_speculative" governor caps its gateway load
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="gpa-prefetch")
+
+
+class Prefetcher:
+    """
+    Per-session speculative jobs: at most one future per slot ('pdf', 'docs'), tagged with its input key.
+    A result is handed out once; the slot then stays occupied so later reruns with the
+    same inputs don't start the same (expensive) job again.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def _run(self, job, fn, args, delay):
+        # Debounce: the real work only starts once the inputs have been left alone for `delay` seconds
+        if delay and job["superseded"].wait(delay):
+            return None
+        with self.lock:
+            if job["superseded"].is_set():
+                return None
+            job["started"] = True
+        return fn(*args)
+
+    def submit(self, slot, key, fn, *args, delay=0):
+        """
+        Starts `fn(*args)` for `key` (after `delay` idle seconds) unless a job for the same key already exists.
+        Returns the future, or None while a job for older inputs is already doing its expensive work.
+        """
+        with self.lock:
+            job = self.jobs.get(slot)
+            if job and job["key"] == key:
+                return job["future"]
+            if job and not job["future"].done():
+                # A job still waiting out its delay is simply replaced; a running LLM call cannot be
+                # stopped, so keep at most one in flight and start the new one on a later rerun.
+                if job["started"]:
+                    return None
+                job["superseded"].set()
+                job["future"].cancel()
+            job = {"key": key, "consumed": False, "started": False, "delay": delay, "superseded": threading.Event()}
+            job["future"] = self.executor.submit(self._run, job, fn, args, delay)
+            self.jobs[slot] = job
+            return job["future"]
+
+    def take(self, slot, key):
+        """
+        Returns the prefetched result if it was computed for `key` (waiting if still running),
+        or None on mismatch / failure / already used, so the caller falls back to the normal path.
+        """
+        with self.lock:
+            job = self.jobs.get(slot)
+            if not job or job["key"] != key or job["consumed"]:
+                return None
+            job["consumed"] = True
+            if job["delay"] and not job["started"] and not job["future"].done():
+                # Still in its idle delay: the foreground path is faster than the speculative quota
+                job["superseded"].set()
+                return None
+        try:
+            return job["future"].result()
+        except Exception as e:
+            print(f"⚠️ Prefetch '{slot}' failed, recomputing: {e}")
+            return None
+
+    def status(self):
+        with self.lock:
+            return {
+                slot: "used" if job["consumed"] else (
+                    "done" if job["future"].done() else ("running" if job["started"] else "waiting"))
+                for slot, job in self.jobs.items()
+            }
+
+
+def get_prefetcher():
+    if "prefetcher" not in st.session_state:
+        st.session_state.prefetcher = Prefetcher(_executor())
+    return st.session_state.prefetcher
+
+
+def docs_key(course_name, raw_ids, pdf_hash, today_str, deadline_str):
+    return ("Docs", course_name, raw_ids, pdf_hash, today_str, deadline_str)
+
+
+def _generate_docs(pdf_future, course_name, raw_ids, today_str, deadline_str):
+    pdf_text = pdf_future.result()
+    prompt = build_prompt(course_name, raw_ids, pdf_text, today_str, deadline_str, "Docs")
+    # Own low-priority quota: a speculative call never holds one of the foreground "llm" slots
+    return generate_project_plan(course_name, raw_ids, pdf_text, today_str, deadline_str, "Docs", prompt=prompt,
+                                 governor_name="llm_speculative")
+
+
+def speculate(pdf_bytes, pdf_hash, course_name, raw_ids, today_str, deadline_str, use_docs):
+    """
+    Called on every rerun in speculative mode; (re)starts jobs whose inputs changed.
+    The Docs job only calls the LLM after the inputs stayed unchanged for SPECULATION_IDLE_SECONDS.
+    Pass use_docs=False to skip the (LLM-backed) Docs speculation, e.g. while the form is not filled in yet.
+    """
+    prefetcher = get_prefetcher()
+    # Same cache_data entry as the normal path, so a discarded prefetch never means a second parse
+    pdf_future = prefetcher.submit("pdf", pdf_hash, pdf_text_for_bytes, pdf_bytes, pdf_hash)
+    if pdf_future and use_docs and course_name.strip() and raw_ids.strip():
+        prefetcher.submit("docs", docs_key(course_name, raw_ids, pdf_hash, today_str, deadline_str),
+                          _generate_docs, pdf_future, course_name, raw_ids, today_str, deadline_str,
+                          delay=SPECULATION_IDLE_SECONDS)
+    return prefetcher.status()
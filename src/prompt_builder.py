@@ -0,0 +1,167 @@
+import re
+from collections import Counter
+from string import Template
+from textwrap import dedent
+
+# 🟢 Prompt templates are dedented and compiled once at import time,
+# instead of rebuilding an indented f-string on every generate_project_plan() call.
+
+def _compile(text):
+    lines = [line.rstrip() for line in dedent(text).strip().splitlines()]
+    return Template("\n".join(lines))
+
+
+SLIDES_TEMPLATE = _compile("""
+    You are a Project Manager.
+    [Course]: $course_name
+    [Members]: $members
+    [Assignment]: $assignment_text
+    [Date]: Today is $current_date, Due is $due_date.
+
+    Please generate a "Google Slides Outline" for this project.
+
+    【STRICT FORMAT REQUIREMENTS】:
+    1. Output a valid JSON object: {"slides": [ ... ]}.
+    2. **First Slide (Cover)** must contain "title" (Main Title) and "subtitle" (Members).
+    3. **Subsequent Slides** must contain "title" and "points" (Bullet points, separated by \\n).
+    4. Every slide has "title", "subtitle" and "points"; use "" for fields that do not apply.
+    5. Do NOT use Markdown formatting (no ```json). Just raw JSON.
+    6. Minimum 7 slides.
+
+    【Example Format】:
+    {"slides": [
+    {"title": "$course_name Final Project: [Topic]", "subtitle": "Members: $members\\nDate: $current_date", "points": ""},
+    {"title": "Project Goals", "subtitle": "", "points": "1. Goal A\\n2. Goal B"},
+    {"title": "Task Allocation", "subtitle": "", "points": "• Alice: Frontend\\n• Bob: Backend"}
+    ]}
+""")
+
+REPAIR_TEMPLATE = _compile("""
+    You are a Project Manager fixing a Google Slides outline for the course "$course_name".
+    Current outline (slide number. title):
+    $outline
+
+    Slides $positions are missing or malformed. Write ONLY those $count slide(s), in that order.
+    Each slide needs "title", "subtitle" ("" if not the cover) and "points" (bullet points separated by \\n).
+    Output a valid JSON object: {"slides": [ ... ]} with exactly $count item(s). No Markdown.
+""")
+
+DOCS_TEMPLATE = _compile("""
+    You are a professional Project Manager.
+    [Course]: $course_name
+    [Members]: $members
+    [Assignment]: $assignment_text
+    [Date]: Today is $current_date, Due is $due_date.
+
+    Please generate a comprehensive project proposal.
+
+    【STRICT FORMAT - NO MARKDOWN TABLES】:
+    1. **Plain Text Only**.
+    2. **Do NOT use '|' characters**. Do NOT use Markdown tables.
+    3. Use [Brackets] for headers.
+    4. Task Allocation Format: "- [Task Name]: [Owner] (Deliverable: [Item])"
+
+    【Example Output】:
+    [1. Project Goal]
+    The goal is to develop...
+
+    [2. Tasks]
+    - Crawler Dev: Alice (Deliverable: Python script)
+    - Backend: Bob (Deliverable: API Docs)
+
+    [3. Schedule]
+    - 12/20: Arch Review
+""")
+
+# --- Assignment text normalization ---
+PAGE_BREAK = "\f"
+# Headers/footers/page numbers are only looked for in the first/last lines of each page
+EDGE_LINES = 2
+# "3", "- 3 -", "Page 3", "p. 3", "3 of 10", "3/10", "第 3 頁" (a bare number only up to 3 digits, so years stay)
+_PAGE_NUMBER_RE = re.compile(
+    r"^\s*(?:(?:page|p\.)\s*\d+(?:\s*(?:of|/)\s*\d+)?|\d+\s*(?:of|/)\s*\d+|[-–—]?\s*\d{1,3}\s*[-–—]?|第\s*\d+\s*頁)\s*$",
+    re.IGNORECASE)
+# Page-number fragment inside a longer footer: "Week 3 Handout - Page 2" -> "week 3 handout - page #"
+_PAGE_REF_RE = re.compile(r"(?:page|p\.)\s*\d+(?:\s*(?:of|/)\s*\d+)?|\b\d+\s*(?:of|/)\s*\d+\s*$|第\s*\d+\s*頁",
+                          re.IGNORECASE)
+_HYPHEN_BREAK_RE = re.compile(r"(\w)-\n(\w)")
+_SPACES_RE = re.compile(r"[ \t ]+")
+
+
+def _boilerplate_key(line):
+    # Only the page reference is folded; other digits (e.g. "Question 1 (10 points)") stay distinct
+    return _PAGE_REF_RE.sub("#", line.lower())
+
+
+def _edge_indexes(page):
+    filled = [index for index, line in enumerate(page) if line]
+    return set(filled[:EDGE_LINES] + filled[-EDGE_LINES:])
+
+
+def normalize_assignment_text(text):
+    """
+    Compacts text extracted from a PDF before it goes into a prompt:
+    - joins words hyphenated across line breaks
+    - drops page-number lines at the top/bottom of a page
+    - drops headers/footers repeated at the top/bottom of most pages (pages are separated by form feeds)
+    - collapses runs of whitespace / blank lines and exact duplicate lines
+    """
+    if not text:
+        return ""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _HYPHEN_BREAK_RE.sub(r"\1\2", text)
+    pages = [[_SPACES_RE.sub(" ", line).strip() for line in page.split("\n")]
+             for page in text.split(PAGE_BREAK)]
+    # extract_text_from_pdf ends every page with a form feed, which leaves an empty last "page"
+    while pages and not any(pages[-1]):
+        pages.pop()
+    edges = [_edge_indexes(page) for page in pages]
+
+    boilerplate = set()
+    if len(pages) >= 3:
+        # A short edge line showing up on at least half the pages is a header/footer
+        seen = Counter()
+        for page, edge in zip(pages, edges):
+            seen.update({_boilerplate_key(page[index]) for index in edge if len(page[index]) <= 80})
+        threshold = max(2, (len(pages) + 1) // 2)
+        boilerplate = {key for key, count in seen.items() if count >= threshold}
+
+    kept = []
+    emitted = set()
+    for page, edge in zip(pages, edges):
+        for index, line in enumerate(page):
+            if not line:
+                if kept and kept[-1]:
+                    kept.append("")
+                continue
+            if index in edge and (_PAGE_NUMBER_RE.match(line) or _boilerplate_key(line) in boilerplate):
+                continue
+            # Long lines repeated verbatim (e.g. a rubric pasted twice) are kept once
+            if len(line) > 40 and line in emitted:
+                continue
+            emitted.add(line)
+            kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def estimate_tokens(text):
+    """
+    Rough token estimate without a tokenizer dependency:
+    CJK characters ~1 token each, other text ~4 characters per token.
+    """
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if '　' <= ch <= '鿿' or '豈' <= ch <= '﫿' or '＀' <= ch <= '￯')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def build_prompt(course_name, members, assignment_text, current_date, due_date, output_format="Docs"):
+    """Renders the Docs or Slides prompt from the precompiled templates. Pure function, safe to cache."""
+    template = SLIDES_TEMPLATE if output_format == "Slides" else DOCS_TEMPLATE
+    return template.safe_substitute(
+        course_name=course_name,
+        members=members,
+        assignment_text=normalize_assignment_text(assignment_text),
+        current_date=current_date,
+        due_date=due_date,
+    )
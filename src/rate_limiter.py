@@ -0,0 +1,166 @@
+import time
+import threading
+from contextlib import contextmanager
+from config import env_number, load_env
+
+# Default quota per external API family: (requests per second, burst size, max concurrent calls)
+# Override in .env with e.g. LLM_RATE_LIMIT=0.5, LLM_BURST=1, LLM_MAX_CONCURRENCY=2
+# A rate of 0 disables the token bucket (concurrency cap still applies).
+API_DEFAULTS = {
+    "llm": (1.0, 2, 2),
+    # Speculative (background) LLM calls get their own, smaller quota so they never hold a foreground "llm" slot
+    "llm_speculative": (0.2, 1, 1),
+    "gmail": (2.0, 5, 4),
+    "drive": (8.0, 10, 5),
+    # Not an external API: caps concurrent PDF parses so simultaneous uploads can't exhaust memory
+    "pdf": (0, 1, 2),
+}
+
+
+class TokenBucket:
+    """Classic token bucket: refills `rate` tokens per second up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blocks until one token is available."""
+        if self.rate <= 0 and not self.blocked_until:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.rate <= 0 or self.tokens >= 1:
+                    if self.rate > 0:
+                        self.tokens -= 1
+                    return
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Stops handing out tokens for `seconds` (e.g. after a 429 with Retry-After)."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = 0.0
+
+
+class ApiGovernor:
+    """
+    Shared rate limiter + concurrency cap for one external API family.
+    Usage:
+        with get_governor("gmail").slot():
+            request.execute()
+    """
+
+    def __init__(self, name, rate, burst, max_concurrency):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.bucket = TokenBucket(rate, burst)
+        self.semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.throttled = 0
+
+    @contextmanager
+    def slot(self):
+        start = time.monotonic()
+        with self.lock:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+        self.semaphore.acquire()
+        try:
+            self.bucket.acquire()
+        except BaseException:
+            self.semaphore.release()
+            with self.lock:
+                self.queue_depth -= 1
+            raise
+
+        waited = time.monotonic() - start
+        with self.lock:
+            self.queue_depth -= 1
+            self.in_flight += 1
+            self.calls += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        try:
+            yield waited
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            self.semaphore.release()
+
+    def penalize(self, retry_after=None):
+        """Called when the API answers 429 / quota exceeded; backs off every caller."""
+        with self.lock:
+            self.throttled += 1
+        self.bucket.pause(retry_after if retry_after else 1.0)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "in_flight": self.in_flight,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "avg_wait_s": round(self.total_wait / self.calls, 3) if self.calls else 0.0,
+                "max_wait_s": round(self.max_wait, 3),
+                "throttled": self.throttled,
+            }
+
+
+_governors = {}
+_registry_lock = threading.Lock()
+
+
+def get_governor(name):
+    """Returns the process-wide governor for an API family ('llm', 'gmail', 'drive')."""
+    load_env()
+    with _registry_lock:
+        if name not in _governors:
+            rate, burst, concurrency = API_DEFAULTS.get(name, (0, 1, 4))
+            prefix = name.upper()
+            _governors[name] = ApiGovernor(
+                name,
+                env_number(f"{prefix}_RATE_LIMIT", rate, float),
+                env_number(f"{prefix}_BURST", burst, int),
+                env_number(f"{prefix}_MAX_CONCURRENCY", concurrency, int),
+            )
+        return _governors[name]
+
+
+def governor_stats():
+    """Snapshot of queue-depth / wait-time metrics for every governor in use."""
+    with _registry_lock:
+        governors = list(_governors.values())
+    return {g.name: g.stats() for g in governors}
+
+
+def parse_retry_after(value):
+    """Parses a Retry-After header (seconds form). Returns None if absent or unparsable."""
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
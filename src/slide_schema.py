@@ -0,0 +1,148 @@
+import json
+import re
+
+# 🟢 Schema for the Slides outline. Sent to the provider as native structured output
+# (OpenAI json_schema / Gemini responseSchema / ollama format) and used to validate the result.
+# Every field is required so OpenAI strict mode accepts it; unused fields come back as "".
+SLIDE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "subtitle": {"type": "string"},
+        "points": {"type": "string"},
+    },
+    "required": ["title", "subtitle", "points"],
+    "additionalProperties": False,
+}
+
+SLIDES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "slides": {"type": "array", "items": SLIDE_SCHEMA},
+    },
+    "required": ["slides"],
+    "additionalProperties": False,
+}
+
+
+def to_gemini_schema(schema):
+    """Gemini's responseSchema is an OpenAPI subset: upper-case types, no additionalProperties."""
+    converted = {}
+    for key, value in schema.items():
+        if key == "additionalProperties":
+            continue
+        if key == "type":
+            converted[key] = value.upper()
+        elif key == "properties":
+            converted[key] = {name: to_gemini_schema(sub) for name, sub in value.items()}
+        elif key == "items":
+            converted[key] = to_gemini_schema(value)
+        else:
+            converted[key] = value
+    return converted
+
+
+def _clean_text(value):
+    if isinstance(value, list):
+        value = "\n".join(f"• {item}" for item in value)
+    elif value is None:
+        value = ""
+    text = str(value).replace("**", "").replace("##", "")
+    return text.replace("|---|", "").replace("|", "  ").strip()
+
+
+def _salvage_array(text):
+    """
+    Decodes complete objects from a (possibly truncated or malformed) JSON array,
+    so one broken slide doesn't throw away the rest. Unparsable entries become None.
+    """
+    start = text.find('[')
+    if start == -1:
+        return None
+    decoder = json.JSONDecoder()
+    items = []
+    pos = start + 1
+    while pos < len(text):
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text) or text[pos] == ']':
+            break
+        try:
+            item, pos = decoder.raw_decode(text, pos)
+            items.append(item)
+        except json.JSONDecodeError:
+            # Skip to the next object start and mark this slot as broken
+            items.append(None)
+            next_obj = text.find('{', pos + 1)
+            if next_obj == -1:
+                break
+            pos = next_obj
+    return items or None
+
+
+def parse_slides(content):
+    """
+    Turns raw LLM output into a list of slide candidates (not yet validated).
+    Accepts {"slides": [...]}, a bare array, markdown-fenced JSON or chatty text around it.
+    Returns None when nothing usable is found.
+    """
+    if not content:
+        return None
+    text = content.strip()
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        match = re.search(r'\[.*\]', text, re.DOTALL)
+        try:
+            data = json.loads(match.group(0)) if match else None
+        except json.JSONDecodeError:
+            data = None
+        if data is None:
+            data = _salvage_array(text)
+    if isinstance(data, dict):
+        data = data.get("slides")
+    return data if isinstance(data, list) and data else None
+
+
+def validate_slides(items, positions=None):
+    """
+    Validates and normalizes slide candidates against SLIDE_SCHEMA.
+    Returns (slides, broken) where `slides` has None at every index listed in `broken`.
+    `positions` gives each item's place in the full outline (default: its index), e.g. for repaired slides.
+    - Cover slide (position 0) needs a title.
+    - Content slides need a title and points.
+    Fixable issues (list points, markdown, numbers, missing optional fields) are repaired in place.
+    """
+    slides = []
+    broken = []
+    positions = list(positions) if positions is not None else range(len(items))
+    for i, item in enumerate(items):
+        if isinstance(item, str):
+            try:
+                item = json.loads(item)
+            except json.JSONDecodeError:
+                item = None
+        if not isinstance(item, dict):
+            slides.append(None)
+            broken.append(i)
+            continue
+
+        slide = {
+            "title": _clean_text(item.get("title")),
+            "subtitle": _clean_text(item.get("subtitle")),
+            "points": _clean_text(item.get("points", item.get("content", item.get("bullets")))),
+        }
+        if not slide["title"] or (positions[i] > 0 and not slide["points"]):
+            slides.append(None)
+            broken.append(i)
+            continue
+        slides.append(slide)
+    return slides, broken
+
+
+def merge_repaired(slides, broken, replacements):
+    """Puts regenerated slides back at their original positions; drops any that are still broken."""
+    for index, replacement in zip(broken, replacements):
+        slides[index] = replacement
+    return [slide for slide in slides if slide]
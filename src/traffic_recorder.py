@@ -0,0 +1,232 @@
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from config import get_settings
+from memory_guard import JsonBodyStream
+
+# 🟢 Record / replay of external HTTP traffic (LLM gateway + Google APIs)
+# GPA_TRAFFIC_MODE=record  -> real calls, every exchange + its latency saved to GPA_CASSETTE
+# GPA_TRAFFIC_MODE=replay  -> no network; responses served from the cassette,
+#                             sleeping recorded latency / GPA_REPLAY_SPEED (0 = instant)
+MODES = ("off", "record", "replay")
+
+# Query parameters that carry secrets and must never end up in a cassette
+_SECRET_PARAMS = {"key", "access_token", "api_key"}
+# Exchanges whose request body must match the recording on replay. Google bodies are not
+# deterministic (e.g. MIME boundaries in Gmail messages), so those are matched by URL only.
+BODY_MATCHED_KINDS = {"llm"}
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when a request has no recorded counterpart."""
+
+
+def normalize_url(url):
+    """Drops secret query params and sorts the rest so matching is stable."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in _SECRET_PARAMS)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}" + (f"?{urlencode(query)}" if query else "")
+
+
+def _encode_payload(payload):
+    return json.dumps(payload, sort_keys=True)
+
+
+def _body_digest(body):
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+class Cassette:
+    """A JSON file of recorded exchanges: [{kind, method, url, request_sha, status, headers, body, elapsed}]."""
+
+    def __init__(self, path, mode="replay", speed=1.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown traffic mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.speed = float(speed)
+        self.lock = threading.Lock()
+        self.interactions = []
+        self.used = set()
+        if mode == "replay":
+            with open(self.path, encoding="utf-8") as f:
+                self.interactions = json.load(f)["interactions"]
+
+    def record(self, kind, method, url, request_body, status, headers, body, elapsed):
+        with self.lock:
+            self.interactions.append({
+                "kind": kind,
+                "method": method.upper(),
+                "url": normalize_url(url),
+                "request_sha": _body_digest(request_body),
+                "status": status,
+                "headers": {k.lower(): v for k, v in headers.items() if k.lower() in ("content-type", "retry-after")},
+                "body": body,
+                "elapsed": round(elapsed, 4),
+            })
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"interactions": self.interactions}, f, ensure_ascii=False, indent=2)
+
+    def play(self, kind, method, url, request_body=None):
+        """
+        Returns the first unused interaction matching (kind, method, url), honouring recorded latency.
+        For BODY_MATCHED_KINDS the request body must hash to the recorded request_sha too, so a changed
+        prompt fails loudly instead of silently getting the old response.
+        """
+        key = (kind, method.upper(), normalize_url(url))
+        digest = _body_digest(request_body) if kind in BODY_MATCHED_KINDS else None
+        stale = None
+        with self.lock:
+            for index, item in enumerate(self.interactions):
+                if index in self.used or (item["kind"], item["method"], item["url"]) != key:
+                    continue
+                if digest is not None and item.get("request_sha") != digest:
+                    stale = stale or item.get("request_sha")
+                    continue
+                self.used.add(index)
+                break
+            else:
+                if stale:
+                    raise CassetteMissError(f"Request body for {key[1]} {key[2]} changed since recording "
+                                            f"(sha {digest}, recorded {stale}); re-record the cassette")
+                raise CassetteMissError(f"No recorded response for {key[1]} {key[2]}")
+        if self.speed > 0:
+            time.sleep(item["elapsed"] / self.speed)
+        return item
+
+    def recorded_time(self):
+        """Sum of recorded latencies, i.e. the sequential wall time of the original run."""
+        return sum(item["elapsed"] for item in self.interactions)
+
+
+_active = None
+_active_lock = threading.Lock()
+
+
+def get_cassette():
+    """Returns the active cassette (explicit use_cassette() first, then .env), or None when off."""
+    global _active
+    with _active_lock:
+        if _active is None:
+            settings = get_settings()
+            if settings.traffic_mode not in ("", "off"):
+                _active = Cassette(settings.cassette_path, settings.traffic_mode, settings.replay_speed)
+        return _active
+
+
+def is_replaying():
+    cassette = get_cassette()
+    return cassette is not None and cassette.mode == "replay"
+
+
+@contextmanager
+def use_cassette(path, mode="replay", speed=0):
+    """Activates a cassette for the duration of the block (tests / benchmarks)."""
+    global _active
+    with _active_lock:
+        previous, _active = _active, Cassette(path, mode, speed)
+        cassette = _active
+    try:
+        yield cassette
+    finally:
+        with _active_lock:
+            _active = previous
+
+
+# --- LLM transport (requests) ---
+class ReplayResponse:
+    """Just enough of requests.Response for llm_helper."""
+
+    def __init__(self, item):
+        self.status_code = item["status"]
+        self.headers = item.get("headers", {})
+        self.text = item["body"]
+        self.elapsed_s = item["elapsed"]
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def http_post(url, headers=None, json=None, timeout=None):
+    """
+    requests.post() with record / replay support.
+    The JSON body is stream-encoded (JsonBodyStream) rather than serialized into one string.
+    """
+    import requests
+
+    cassette = get_cassette()
+    # Full serialization (for the request hash) only happens when a cassette is active
+    request_body = None if cassette is None or json is None else _encode_payload(json)
+    if cassette is not None and cassette.mode == "replay":
+        return ReplayResponse(cassette.play("llm", "POST", url, request_body))
+
+    headers = dict(headers or {}, **{"Content-Type": "application/json"})
+    body = JsonBodyStream(json) if json is not None else None
+    if cassette is None:
+        return requests.post(url, headers=headers, data=body, timeout=timeout)
+
+    start = time.monotonic()
+    response = requests.post(url, headers=headers, data=body, timeout=timeout)
+    cassette.record("llm", "POST", url, request_body, response.status_code,
+                    dict(response.headers), response.text, time.monotonic() - start)
+    return response
+
+
+# --- Google transport (httplib2, used by googleapiclient) ---
+class RecordingHttp:
+    """Wraps an httplib2.Http-like object and records every exchange."""
+
+    def __init__(self, http, cassette):
+        self.http = http
+        self.cassette = cassette
+
+    # googleapiclient tweaks redirect_codes on the http it is given; forward it to the real one
+    @property
+    def redirect_codes(self):
+        return getattr(self.http, "redirect_codes", set())
+
+    @redirect_codes.setter
+    def redirect_codes(self, value):
+        self.http.redirect_codes = value
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        start = time.monotonic()
+        resp, content = self.http.request(uri, method=method, body=body, headers=headers, **kwargs)
+        text = content.decode("utf-8", errors="replace") if isinstance(content, bytes) else content
+        self.cassette.record("google", method, uri, body, resp.status, dict(resp), text, time.monotonic() - start)
+        return resp, content
+
+
+class ReplayHttp:
+    """httplib2.Http stand-in that serves googleapiclient from a cassette."""
+
+    def __init__(self, cassette):
+        self.cassette = cassette
+        self.redirect_codes = set()
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        import httplib2
+
+        item = self.cassette.play("google", method, uri)
+        resp = httplib2.Response(dict(item.get("headers", {}), status=str(item["status"])))
+        return resp, item["body"].encode("utf-8")
+
+
+def wrap_http(http):
+    """Wraps an authorized http for recording; returns it untouched when not recording."""
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == "record":
+        return RecordingHttp(http, cassette)
+    return http
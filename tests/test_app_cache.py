@@ -0,0 +1,86 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from unittest.mock import patch
+import app_cache
+from streamlit.testing.v1 import AppTest
+from config import Settings
+
+def test_recipients_cached():
+    print("🧪 Testing Recipient Normalization Cache...")
+    app_cache.clear_cache()
+
+    first = app_cache.normalize_recipients("student123, alice@yahoo.com , ", "gs.ncku.edu.tw")
+    second = app_cache.normalize_recipients("student123, alice@yahoo.com , ", "gs.ncku.edu.tw")
+    stats = app_cache.cache_stats()["recipients"]
+    print(f"📋 {first} | Stats: {stats}")
+
+    assert first == ["student123@gs.ncku.edu.tw", "alice@yahoo.com"]
+    assert second == first
+    assert stats == {"calls": 2, "misses": 1, "hits": 1}
+    print("✅ SUCCESS: Second call served from cache.")
+
+def test_pdf_text_keyed_by_content():
+    print("🧪 Testing PDF Text Cache (by hash)...")
+    app_cache.clear_cache()
+
+    class FakeUpload:
+        def __init__(self, data):
+            self.data = data
+        def getvalue(self):
+            return self.data
+
+    with patch('app_cache.extract_text_from_pdf', side_effect=lambda f: f"text:{f.read().decode()}") as mock_extract:
+        a1 = app_cache.get_pdf_text(FakeUpload(b"pdf-A"))
+        a2 = app_cache.get_pdf_text(FakeUpload(b"pdf-A"))
+        b1 = app_cache.get_pdf_text(FakeUpload(b"pdf-B"))
+
+        print(f"📊 Extractions: {mock_extract.call_count}")
+        assert (a1, a2, b1) == ("text:pdf-A", "text:pdf-A", "text:pdf-B")
+        assert mock_extract.call_count == 2
+
+    app_cache.clear_cache("pdf_text")
+    assert app_cache.cache_stats()["pdf_text"]["calls"] == 0
+    print("✅ SUCCESS: Same content parsed once, clear_cache resets it.")
+
+def test_google_http_reused_per_thread():
+    print("🧪 Testing Per-Thread Google Connection Reuse...")
+    import threading
+    from google.oauth2.credentials import Credentials
+    from google_utils import _thread_local_http
+
+    build_request = _thread_local_http(Credentials(token="test-token"))
+    first = build_request(None, lambda resp, content: content, "https://gmail.googleapis.com/a")
+    second = build_request(None, lambda resp, content: content, "https://gmail.googleapis.com/b")
+
+    other = []
+    worker = threading.Thread(target=lambda: other.append(
+        build_request(None, lambda resp, content: content, "https://gmail.googleapis.com/c")))
+    worker.start()
+    worker.join()
+
+    assert first.http is second.http, "Same thread opened a new connection per request"
+    assert other[0].http is not first.http, "Threads must not share one httplib2.Http"
+    print("✅ SUCCESS: One AuthorizedHttp per thread.")
+
+def admin_panel_app():
+    import app_cache
+    app_cache.render_cache_admin()
+
+def test_cache_admin_hidden_by_default():
+    print("🧪 Testing Cache Admin Gate...")
+    for admin_mode, expected in ((False, 0), (True, 1)):
+        settings = Settings(llm_provider="ncku", api_key="", model_name="gpt-oss:120b", api_url="",
+                            default_email_domain="gs.ncku.edu.tw", admin_mode=admin_mode)
+        with patch('app_cache.get_settings', return_value=settings):
+            at = AppTest.from_function(admin_panel_app).run()
+        print(f"  - ADMIN_MODE={admin_mode}: {len(at.expander)} panel(s)")
+        assert not at.exception
+        assert len(at.expander) == expected
+    print("✅ SUCCESS: Cache controls only shown to admins.")
+
+if __name__ == "__main__":
+    test_recipients_cached()
+    test_pdf_text_keyed_by_content()
+    test_google_http_reused_per_thread()
+    test_cache_admin_hidden_by_default()
@@ -0,0 +1,161 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import time
+from unittest.mock import patch
+from dag_executor import DagExecutor, Node
+from agent_pipeline import build_agent_pipeline
+
+def sleeper(seconds, **outputs):
+    def fn(**kwargs):
+        time.sleep(seconds)
+        return outputs
+    return fn
+
+def test_independent_branches_run_in_parallel():
+    print("🧪 Testing Parallel Branches...")
+    dag = DagExecutor([
+        Node("a", sleeper(0.3, x=1), [], ["x"]),
+        Node("b", sleeper(0.3, y=2), [], ["y"]),
+        Node("join", lambda x, y: {"z": x + y}, ["x", "y"], ["z"]),
+    ])
+    events = []
+    start = time.monotonic()
+    result = dag.run({}, on_event=lambda name, status, executor: events.append((name, status)))
+    elapsed = time.monotonic() - start
+
+    print(f"⏱️ {elapsed:.2f}s | {dag.summary()}")
+    assert result["z"] == 3
+    assert elapsed < 0.55, "Independent nodes ran one after another"
+    assert events[-1] == ("join", "done")
+    assert dag.timings["join"][0] >= max(dag.timings["a"][1], dag.timings["b"][1])
+    print("✅ SUCCESS: Two 0.3s branches finished together.")
+
+def test_failure_skips_downstream_only():
+    print("🧪 Testing Failure Propagation...")
+    def boom():
+        raise RuntimeError("API down")
+
+    dag = DagExecutor([
+        Node("bad", boom, [], ["x"]),
+        Node("after_bad", lambda x: {"y": x}, ["x"], ["y"]),
+        Node("good", lambda: {"z": 1}, [], ["z"]),
+    ])
+    result = dag.run({})
+
+    assert dag.status == {"bad": "failed", "after_bad": "skipped", "good": "done"}
+    assert str(dag.errors["bad"]) == "API down"
+    assert result["z"] == 1 and "y" not in result
+    dot = dag.to_dot()
+    assert 'fillcolor="salmon"' in dot and "(skipped)" in dot
+    print("✅ SUCCESS: Only the failed branch was cut off.")
+
+def test_invalid_graphs_rejected():
+    try:
+        DagExecutor([Node("a", None, ["y"], ["x"]), Node("b", None, ["x"], ["y"])])
+        assert False, "Expected cycle error"
+    except ValueError as e:
+        assert "Cycle" in str(e)
+    try:
+        DagExecutor([Node("a", lambda: {}, ["missing"], ["x"])]).run({})
+        assert False, "Expected missing input error"
+    except ValueError as e:
+        assert "missing" in str(e)
+
+def test_agent_graph_shape():
+    print("🧪 Testing Agent Graph Shape...")
+    dag = build_agent_pipeline((None, None, None, None), use_docs=True, use_slides=True)
+    assert dag.deps["create_doc"] == {"llm_docs"}
+    assert dag.deps["share_slides"] == {"create_slides"}
+    assert dag.deps["send_email"] >= {"share_doc", "share_slides"}
+    dot = dag.to_dot()
+    assert "share_doc -> send_email;" in dot
+    # Transitive edges (create_doc -> send_email) are not drawn
+    assert "create_doc -> send_email;" not in dot
+
+    slides_only = build_agent_pipeline((None, None, None, None), use_docs=False, use_slides=True)
+    assert "llm_docs" not in slides_only.nodes
+    assert slides_only.deps["send_email"] >= {"share_slides"}
+    print("✅ SUCCESS: Docs and Slides are independent branches joined at Send Email.")
+
+def test_email_not_sent_when_a_branch_fails():
+    print("🧪 Testing Email Gate...")
+    with patch('agent_pipeline.generate_project_plan', return_value="plan"), \
+         patch('agent_pipeline.generate_slides_outline', return_value=[{"title": "Cover"}]), \
+         patch('agent_pipeline.create_doc_with_content', return_value=("doc1", "https://doc")), \
+         patch('agent_pipeline.create_slides_presentation', return_value=(None, "API error")), \
+         patch('agent_pipeline.share_file_permissions') as mock_share, \
+         patch('agent_pipeline.send_gmail') as mock_send:
+        dag = build_agent_pipeline((None, None, None, None), use_docs=True, use_slides=True)
+        dag.run({"course_name": "TOC", "members": "a", "pdf_text": "x", "today": "2025-01-01",
+                 "deadline": "2025-01-15", "emails": ["a@gs.ncku.edu.tw"]})
+
+    print(f"📊 {[(row['node'], row['status']) for row in dag.summary()]}")
+    assert dag.status["share_doc"] == "done"
+    assert dag.status["create_slides"] == "failed"
+    assert dag.status["send_email"] == "skipped"
+    mock_share.assert_called_once()
+    mock_send.assert_not_called()
+    print("✅ SUCCESS: No email goes out with a missing file.")
+
+def test_pending_prefetch_does_not_block_slides():
+    print("🧪 Testing Prefetch Wait Stays In The Docs Branch...")
+    def slow_take():
+        time.sleep(0.3)  # speculative Docs generation still running
+        return "prefetched plan"
+
+    with patch('agent_pipeline.generate_project_plan') as mock_plan, \
+         patch('agent_pipeline.generate_slides_outline', return_value=[{"title": "Cover"}]), \
+         patch('agent_pipeline.create_doc_with_content', return_value=("doc1", "https://doc")), \
+         patch('agent_pipeline.create_slides_presentation', return_value=("s1", "https://slides")), \
+         patch('agent_pipeline.share_file_permissions'), \
+         patch('agent_pipeline.send_gmail', return_value=(["a@gs.ncku.edu.tw"], [])):
+        dag = build_agent_pipeline((None, None, None, None), use_docs=True, use_slides=True,
+                                   take_prefetched_docs=slow_take)
+        result = dag.run({"course_name": "TOC", "members": "a", "pdf_text": "x", "today": "2025-01-01",
+                          "deadline": "2025-01-15", "emails": ["a@gs.ncku.edu.tw"]})
+
+    print(f"⏱️ llm_slides started at {dag.timings['llm_slides'][0]:.3f}s, share_slides done at {dag.timings['share_slides'][1]:.3f}s")
+    assert result["plan_docs"] == "prefetched plan" and result["docs_prefetched"]
+    mock_plan.assert_not_called()
+    assert dag.timings["share_slides"][1] < 0.2, "Slides branch waited for the Docs prefetch"
+    assert dag.status["send_email"] == "done"
+    print("✅ SUCCESS: Slides finished while Docs was still waiting on the prefetch.")
+
+def test_google_problems_returned_not_drawn():
+    print("🧪 Testing Stage Problems Come Back As Outputs...")
+    from unittest.mock import MagicMock
+    import google_utils
+
+    drive = MagicMock()
+    drive.permissions().create().execute.side_effect = [None, RuntimeError("invalid email")]
+    docs = MagicMock()
+    docs.documents().create().execute.side_effect = RuntimeError("quota")
+
+    # No st.* from pipeline stages: they run on worker threads
+    with patch('google_utils.st') as mock_st, \
+         patch('agent_pipeline.generate_project_plan', return_value="plan"), \
+         patch('agent_pipeline.generate_slides_outline', return_value=[{"title": "Cover"}]), \
+         patch('agent_pipeline.create_slides_presentation', return_value=("s1", "https://slides")), \
+         patch('agent_pipeline.send_gmail', return_value=([], [])):
+        failed = google_utils.share_file_permissions(drive, "f1", ["a@x.com", "bad"])
+        dag = build_agent_pipeline((None, drive, docs, None), use_docs=True, use_slides=True)
+        drive.permissions().create().execute.side_effect = None
+        dag.run({"course_name": "TOC", "members": "a", "pdf_text": "x", "today": "2025-01-01",
+                 "deadline": "2025-01-15", "emails": ["a@x.com"]})
+
+    assert failed == [("bad", "invalid email")]
+    assert dag.status["create_doc"] == "failed"
+    assert "建立文件失敗: quota" in str(dag.errors["create_doc"])
+    assert dag.results["share_slides"]["slides_share_failed"] == []
+    assert not mock_st.method_calls, f"Stage drew to the page: {mock_st.method_calls}"
+    print("✅ SUCCESS: Warnings and errors are returned for the script thread to render.")
+
+if __name__ == "__main__":
+    test_independent_branches_run_in_parallel()
+    test_failure_skips_downstream_only()
+    test_invalid_graphs_rejected()
+    test_agent_graph_shape()
+    test_email_not_sent_when_a_branch_fails()
+    test_pending_prefetch_does_not_block_slides()
+    test_google_problems_returned_not_drawn()
@@ -0,0 +1,56 @@
+import sys
+import os
+import subprocess
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(SRC_DIR)
+
+# Heavy third-party stacks that must NOT be loaded just by importing our modules
+HEAVY_MODULES = ["googleapiclient", "google_auth_oauthlib", "google.oauth2", "requests", "pypdf"]
+
+def run_python(code):
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env, check=True)
+
+def measure_imports(modules):
+    """Returns {module: cumulative import time in ms} from `python -X importtime`."""
+    result = run_python(f"import {', '.join(modules)}")
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line.split("|")]
+        try:
+            timings[parts[2]] = int(parts[1]) / 1000
+        except ValueError:
+            continue
+    return {m: timings.get(m, 0.0) for m in modules}
+
+def test_heavy_modules_are_deferred():
+    print("🧪 Testing Lazy Imports...")
+
+    code = ("import sys, llm_helper, google_utils, rate_limiter, config\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    loaded = run_python(code).stdout.strip()
+    print(f"📦 Heavy modules loaded at import: {loaded or 'none'}")
+
+    assert loaded == "", f"Loaded eagerly: {loaded}"
+    print("✅ SUCCESS: Google / HTTP / PDF stacks load on first use only.")
+
+def test_import_time_benchmark():
+    print("🧪 Import-Time Benchmark (cumulative ms)...")
+
+    ours = measure_imports(["llm_helper", "google_utils"])
+    eager = measure_imports(["googleapiclient.discovery", "google_auth_oauthlib.flow", "requests"])
+
+    for name, ms in {**ours, **eager}.items():
+        print(f"  - {name:<28} {ms:8.1f} ms")
+
+    # Our modules (minus streamlit, which main.py needs anyway) should be far cheaper
+    # than the stacks they used to import eagerly.
+    assert ours["llm_helper"] < sum(eager.values())
+    print("✅ SUCCESS: Benchmark recorded.")
+
+if __name__ == "__main__":
+    test_heavy_modules_are_deferred()
+    test_import_time_benchmark()
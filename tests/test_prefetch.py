@@ -0,0 +1,101 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import io
+import time
+import threading
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from prefetch import Prefetcher
+
+def slow_double(x, calls):
+    calls.append(x)
+    time.sleep(0.05)
+    return x * 2
+
+def test_prefetch_hit_and_miss():
+    print("🧪 Testing Speculative Prefetch...")
+    calls = []
+    prefetcher = Prefetcher(ThreadPoolExecutor(max_workers=2))
+
+    prefetcher.submit("docs", ("TOC", "2025-01-15"), slow_double, 21, calls)
+    # Rerun with identical inputs must not start the job again
+    prefetcher.submit("docs", ("TOC", "2025-01-15"), slow_double, 21, calls)
+
+    assert prefetcher.take("docs", ("TOC", "2025-01-15")) == 42
+    assert calls == [21], f"Job ran {len(calls)} times"
+    # A result is handed out once; a second submit recomputes on the normal path
+    assert prefetcher.take("docs", ("TOC", "2025-01-15")) is None
+    assert prefetcher.status() == {"docs": "used"}
+    print("✅ SUCCESS: Matching inputs reuse the background result.")
+
+def test_prefetch_discarded_when_inputs_change():
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    def blocking_double(x):
+        calls.append(x)
+        started.set()
+        release.wait(5)
+        return x * 2
+
+    prefetcher = Prefetcher(ThreadPoolExecutor(max_workers=2))
+    stale = prefetcher.submit("docs", ("TOC", "2025-01-15"), blocking_double, 1)
+    started.wait(5)
+    # User edits the deadline before submitting
+    assert prefetcher.take("docs", ("TOC", "2025-01-20")) is None
+
+    # The stale LLM call is still running: no second one is started alongside it
+    assert prefetcher.submit("docs", ("TOC", "2025-01-20"), blocking_double, 2) is None
+    release.set()
+    stale.result()
+    prefetcher.submit("docs", ("TOC", "2025-01-20"), blocking_double, 2)
+    assert prefetcher.take("docs", ("TOC", "2025-01-20")) == 4
+    assert calls == [1, 2]
+    print("✅ SUCCESS: Stale speculation discarded, at most one job in flight.")
+
+def test_prefetch_debounced_until_idle():
+    print("🧪 Testing Speculation Debounce...")
+    calls = []
+    prefetcher = Prefetcher(ThreadPoolExecutor(max_workers=2))
+
+    # Three quick edits: only the last inputs ever reach the expensive call
+    for course in ("T", "TO", "TOC"):
+        prefetcher.submit("docs", (course,), slow_double, len(course), calls, delay=0.2)
+        assert prefetcher.status() == {"docs": "waiting"}
+    time.sleep(0.5)
+    assert prefetcher.take("docs", ("TOC",)) == 6
+    assert calls == [3], f"Superseded jobs ran: {calls}"
+
+    # Submitting before the delay is over: the waiting job is dropped, the normal path runs instead
+    prefetcher.submit("pdf", "hash", slow_double, 1, calls, delay=5)
+    assert prefetcher.take("pdf", "hash") is None
+    time.sleep(0.05)
+    assert calls == [3]
+    print("✅ SUCCESS: No LLM call until the inputs settle.")
+
+def test_prefetch_failure_falls_back():
+    def boom():
+        raise RuntimeError("gateway down")
+
+    prefetcher = Prefetcher(ThreadPoolExecutor(max_workers=1))
+    prefetcher.submit("pdf", "hash", boom)
+    assert prefetcher.take("pdf", "hash") is None
+    print("✅ SUCCESS: Failed speculation returns None instead of raising.")
+
+def test_speculative_pdf_uses_shared_cache():
+    import app_cache
+    import prefetch
+    app_cache.clear_cache()
+    with patch('app_cache.extract_text_from_pdf', return_value="text") as mock_extract:
+        # Speculative parse (hash precomputed by main.py), then the submit path reading the same upload
+        assert prefetch.pdf_text_for_bytes(b"%PDF-1", app_cache.pdf_fingerprint(b"%PDF-1")) == "text"
+        assert app_cache.get_pdf_text(io.BytesIO(b"%PDF-1")) == "text"
+    assert mock_extract.call_count == 1
+
+if __name__ == "__main__":
+    test_prefetch_hit_and_miss()
+    test_prefetch_discarded_when_inputs_change()
+    test_prefetch_debounced_until_idle()
+    test_prefetch_failure_falls_back()
+    test_speculative_pdf_uses_shared_cache()
@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from prompt_builder import build_prompt, estimate_tokens, normalize_assignment_text
+
+# Three "pages" separated by form feeds, with a header, a footer, page numbers and a hyphenation break
+RAW_PDF_TEXT = "\f".join([
+    "CS101 Theory of Computation - Spring 2025\nFinal Project\nBuild a regex-to-DFA conver-\nter in Python.\n   Page 1 of 3",
+    "CS101 Theory of Computation - Spring 2025\nDeliverables:   source code,\n\n\n\nreport and demo.\n   Page 2 of 3",
+    "CS101 Theory of Computation - Spring 2025\nGrading: correctness 60%, report 40%.\n3",
+])
+
+def test_normalize_assignment_text():
+    print("🧪 Testing Assignment Text Normalization...")
+
+    text = normalize_assignment_text(RAW_PDF_TEXT)
+    print(text)
+
+    assert "CS101 Theory of Computation" not in text, "Repeated header not removed"
+    assert "Page" not in text, "Page numbers not removed"
+    assert "converter" in text, "Hyphenation break not joined"
+    assert "\n\n\n" not in text and "   " not in text
+    assert "Grading: correctness 60%, report 40%." in text
+    print("✅ SUCCESS: Boilerplate stripped, content kept.")
+
+def test_headings_and_short_pdfs_survive():
+    print("🧪 Testing Content Is Not Mistaken For Boilerplate...")
+
+    # Every page starts with a numbered heading and ends with a page number; pages end in a form feed
+    # exactly like extract_text_from_pdf output
+    questions = "".join(f"Question {i} ({i * 10} points)\nExplain topic {i}.\nPage {i}\f" for i in range(1, 5))
+    text = normalize_assignment_text(questions)
+    print(text)
+    for i in range(1, 5):
+        assert f"Question {i} ({i * 10} points)" in text
+    assert "Page" not in text
+
+    # Two pages (+ trailing form feed) are too few to tell headings from headers
+    two_pages = normalize_assignment_text("Deliverables\nSource code\n2025\f"
+                                          "Deliverables\nReport\f")
+    assert two_pages.count("Deliverables") == 2
+    assert "2025" in two_pages, "A lone year is not a page number"
+
+    # Footers with a page reference are folded, but only at the page edges
+    footers = normalize_assignment_text("\f".join(
+        f"Part {i}\nIntro {i}\nSee Week 3 Handout - Page {i} for details\nSummary {i}\nWeek 3 Handout - Page {i}"
+        for i in range(1, 5)))
+    assert "Week 3 Handout - Page" not in footers.replace("See Week 3 Handout", "")
+    assert footers.count("See Week 3 Handout") == 4
+    print("✅ SUCCESS: Headings, years and 2-page PDFs kept.")
+
+def test_prompt_is_compact():
+    print("🧪 Testing Compiled Prompt Templates...")
+
+    for output_format in ("Docs", "Slides"):
+        prompt = build_prompt("計算理論", "Alice, Bob", RAW_PDF_TEXT, "2025-01-01", "2025-01-15", output_format)
+        lines = prompt.splitlines()
+        print(f"📏 {output_format}: {len(prompt)} chars ≈ {estimate_tokens(prompt)} tokens")
+
+        assert not any(line.startswith(" ") for line in lines), "Template indentation leaked into prompt"
+        assert "[Course]: 計算理論" in prompt
+        assert "Due is 2025-01-15" in prompt
+
+    slides = build_prompt("TOC", "Alice", "x", "2025-01-01", "2025-01-15", "Slides")
+    assert '{"title": "TOC Final Project: [Topic]", "subtitle": "Members: Alice\\nDate: 2025-01-01", "points": ""}' in slides
+    print("✅ SUCCESS: Templates rendered without indentation.")
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("計算理論") == 4
+
+if __name__ == "__main__":
+    test_normalize_assignment_text()
+    test_headings_and_short_pdfs_survive()
+    test_prompt_is_compact()
+    test_estimate_tokens()
@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import time
+import threading
+from rate_limiter import ApiGovernor, TokenBucket
+
+def test_token_bucket_rate():
+    print("🧪 Testing Token Bucket Rate...")
+
+    # 20 tokens/sec with burst 1 -> 5 acquisitions need at least ~0.2s
+    bucket = TokenBucket(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+    print(f"📊 5 acquisitions took {elapsed:.3f}s")
+
+    assert elapsed >= 0.18, "Bucket handed out tokens faster than its rate"
+    print("✅ SUCCESS: Rate respected.")
+
+def test_concurrency_cap_and_metrics():
+    print("🧪 Testing Concurrency Cap (max 2 in flight)...")
+
+    governor = ApiGovernor("test", rate=0, burst=1, max_concurrency=2)
+    peak = {"value": 0}
+    lock = threading.Lock()
+
+    def call():
+        with governor.slot():
+            with lock:
+                peak["value"] = max(peak["value"], governor.in_flight)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = governor.stats()
+    print(f"📊 Peak in flight: {peak['value']} | Stats: {stats}")
+
+    assert peak["value"] <= 2
+    assert stats["calls"] == 6
+    assert stats["max_queue_depth"] >= 3
+    assert stats["max_wait_s"] > 0
+    print("✅ SUCCESS: Concurrency capped and metrics recorded.")
+
+def test_penalize_blocks_callers():
+    print("🧪 Testing 429 Back-off...")
+
+    governor = ApiGovernor("test", rate=0, burst=1, max_concurrency=4)
+    governor.penalize(0.2)
+    start = time.monotonic()
+    with governor.slot():
+        pass
+    elapsed = time.monotonic() - start
+    print(f"📊 Waited {elapsed:.3f}s after penalty")
+
+    assert elapsed >= 0.18
+    assert governor.stats()["throttled"] == 1
+    print("✅ SUCCESS: Callers wait out the Retry-After window.")
+
+if __name__ == "__main__":
+    test_token_bucket_rate()
+    test_concurrency_cap_and_metrics()
+    test_penalize_blocks_callers()
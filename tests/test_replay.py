@@ -0,0 +1,85 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import time
+from unittest.mock import patch
+from config import Settings
+from traffic_recorder import use_cassette, CassetteMissError
+from google_utils import get_google_service
+from agent_pipeline import build_agent_pipeline
+
+CASSETTE = os.path.join(os.path.dirname(__file__), 'cassettes', 'docs_pipeline.json')
+# The cassette was recorded against the NCKU gateway; pin it regardless of the local .env
+NCKU_SETTINGS = Settings(llm_provider="ncku", api_key="unused", model_name="gpt-oss:120b",
+                         api_url="", default_email_domain="gs.ncku.edu.tw")
+EMAILS = ["f74122030@gs.ncku.edu.tw", "bob@gmail.com"]
+
+def run_docs_pipeline():
+    """Same graph main() runs for a Docs-only submission: LLM -> Doc -> share -> email."""
+    pipeline = build_agent_pipeline(get_google_service(), use_docs=True)
+    context = {"course_name": "TOC", "members": "f74122030, bob@gmail.com", "pdf_text": "Build a DFA",
+               "today": "2025-01-01", "deadline": "2025-01-15", "emails": EMAILS}
+    with patch('llm_helper.get_settings', return_value=NCKU_SETTINGS):
+        results = pipeline.run(context)
+    assert not pipeline.errors, pipeline.errors
+    return results["plan_docs"], results["doc_url"], results["emails_sent"], results["emails_failed"]
+
+def test_replay_offline():
+    print("🧪 Testing Offline Replay (instant)...")
+
+    with use_cassette(CASSETTE, speed=0) as cassette:
+        plan, doc_url, sent, failed = run_docs_pipeline()
+        unused = len(cassette.interactions) - len(cassette.used)
+
+    print(f"📄 {doc_url} | 📧 {sent}")
+    assert "[2. Tasks]" in plan
+    assert doc_url == "https://docs.google.com/document/d/doc123/edit"
+    assert sent == EMAILS and failed == []
+    assert unused == 0, f"{unused} recorded exchanges were never replayed"
+    print("✅ SUCCESS: Full pipeline ran without network access.")
+
+def test_replay_timing_regression():
+    print("🧪 Testing Replay Timing (20x speed)...")
+
+    with use_cassette(CASSETTE, speed=20) as cassette:
+        budget = cassette.recorded_time() / 20
+        start = time.monotonic()
+        run_docs_pipeline()
+        elapsed = time.monotonic() - start
+
+    print(f"📊 Recorded {cassette.recorded_time():.2f}s -> replayed in {elapsed:.2f}s (budget {budget:.2f}s)")
+    assert elapsed >= budget * 0.9
+    # Pipeline overhead on top of the recorded network time must stay small
+    assert elapsed <= budget + 1.0, "Pipeline got slower than the recorded baseline"
+    print("✅ SUCCESS: Within timing budget.")
+
+def test_unrecorded_request_fails_loudly():
+    with use_cassette(CASSETTE, speed=0) as cassette:
+        cassette.used.update(range(len(cassette.interactions)))
+        try:
+            cassette.play("llm", "POST", "https://api-gateway.netdb.csie.ncku.edu.tw/api/chat")
+            assert False, "Expected CassetteMissError"
+        except CassetteMissError as e:
+            print(f"✅ SUCCESS: {e}")
+
+def test_changed_prompt_fails_replay():
+    print("🧪 Testing Replay Rejects A Changed Prompt...")
+    with use_cassette(CASSETTE, speed=0):
+        pipeline = build_agent_pipeline(get_google_service(), use_docs=True)
+        context = {"course_name": "TOC", "members": "f74122030, bob@gmail.com", "pdf_text": "Build an NFA",
+                   "today": "2025-01-01", "deadline": "2025-01-15", "emails": EMAILS}
+        with patch('llm_helper.get_settings', return_value=NCKU_SETTINGS):
+            pipeline.run(context)
+
+    error = pipeline.errors.get("llm_docs")
+    print(f"❌ {error}")
+    assert isinstance(error, CassetteMissError), "Old response was replayed for a different prompt"
+    assert "changed since recording" in str(error)
+    assert pipeline.status["send_email"] == "skipped"
+    print("✅ SUCCESS: Stale cassette detected.")
+
+if __name__ == "__main__":
+    test_replay_offline()
+    test_replay_timing_regression()
+    test_unrecorded_request_fails_loudly()
+    test_changed_prompt_fails_replay()
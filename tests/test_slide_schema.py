@@ -0,0 +1,133 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import json
+from unittest.mock import patch, MagicMock
+from config import Settings
+from custom_exceptions import LLMGenerationError
+from rate_limiter import ApiGovernor
+from llm_helper import generate_slides_outline
+from slide_schema import parse_slides, validate_slides, to_gemini_schema, SLIDES_SCHEMA
+
+OPENAI_SETTINGS = Settings(llm_provider="openai", api_key="sk-test", model_name="gpt-4o",
+                           api_url="", default_email_domain="gs.ncku.edu.tw")
+
+# rate=0 disables the token bucket; these tests make several back-to-back calls
+UNTHROTTLED = ApiGovernor("llm", rate=0, burst=1, max_concurrency=1)
+
+def openai_response(content):
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = {"choices": [{"message": {"content": content}}]}
+    return response
+
+def test_parse_and_validate():
+    print("🧪 Testing Slide Parsing & Validation...")
+
+    cases = [
+        '{"slides": [{"title": "Cover", "subtitle": "Alice", "points": ""}]}',
+        'Sure!\n```json\n[{"title": "Cover", "subtitle": "Alice"}]\n```',
+        # Truncated output: the complete first slide must survive
+        '[{"title": "Cover", "subtitle": "Alice"}, {"title": "Go',
+    ]
+    for case in cases:
+        slides, broken = validate_slides(parse_slides(case))
+        print(f"  - {case[:40]!r} -> {slides}")
+        assert slides[0]["title"] == "Cover" and slides[0]["subtitle"] == "Alice"
+
+    slides, broken = validate_slides([
+        {"title": "Cover", "subtitle": "Team"},
+        {"title": "**Goals**", "points": ["A", "B"]},   # repairable: markdown + list points
+        {"title": "No points"},                          # broken: content slide without points
+        "not a slide",                                   # broken
+    ])
+    assert slides[1] == {"title": "Goals", "subtitle": "", "points": "• A\n• B"}
+    assert broken == [2, 3]
+    assert parse_slides("no json here") is None
+    print("✅ SUCCESS: Valid slides kept, broken ones flagged.")
+
+def test_gemini_schema_conversion():
+    schema = to_gemini_schema(SLIDES_SCHEMA)
+    assert schema["type"] == "OBJECT"
+    assert schema["properties"]["slides"]["items"]["properties"]["title"]["type"] == "STRING"
+    assert "additionalProperties" not in json.dumps(schema)
+
+def test_only_broken_slides_regenerated():
+    print("🧪 Testing Partial Slide Repair...")
+
+    first = json.dumps({"slides": [
+        {"title": "Cover", "subtitle": "Alice, Bob", "points": ""},
+        {"title": "Goals", "subtitle": "", "points": ""},          # broken
+        {"title": "Schedule", "subtitle": "", "points": "12/20: Review"},
+    ]})
+    repair = json.dumps({"slides": [{"title": "Goals", "subtitle": "", "points": "Ship a DFA tool"}]})
+
+    with patch('llm_helper.get_settings', return_value=OPENAI_SETTINGS), \
+         patch('requests.post', side_effect=[openai_response(first), openai_response(repair)]) as mock_post:
+        slides = generate_slides_outline("TOC", "Alice, Bob", "Build a DFA", "2025-01-01", "2025-01-15")
+
+        payload = json.loads(mock_post.call_args_list[0].kwargs["data"].read_all())
+        repair_prompt = json.loads(mock_post.call_args_list[1].kwargs["data"].read_all())["messages"][0]["content"]
+        print(f"📊 API Calls: {mock_post.call_count}")
+
+    assert payload["response_format"]["type"] == "json_schema"
+    assert payload["response_format"]["json_schema"]["schema"] == SLIDES_SCHEMA
+    assert mock_post.call_count == 2
+    assert "Slides 2 are missing or malformed" in repair_prompt
+    assert [s["title"] for s in slides] == ["Cover", "Goals", "Schedule"]
+    assert slides[1]["points"] == "Ship a DFA tool"
+    print("✅ SUCCESS: One targeted repair call instead of a full re-generation.")
+
+def test_all_broken_outline_regenerated_once():
+    print("🧪 Testing Full Regeneration When Every Slide Is Broken...")
+
+    all_broken = json.dumps({"slides": [{"title": "", "subtitle": "", "points": ""}, "oops"]})
+    good = json.dumps({"slides": [{"title": "Cover", "subtitle": "Alice", "points": ""},
+                                  {"title": "Goals", "subtitle": "", "points": "Ship it"}]})
+
+    with patch('llm_helper.get_settings', return_value=OPENAI_SETTINGS), \
+         patch('llm_helper.get_governor', return_value=UNTHROTTLED), \
+         patch('requests.post', side_effect=[openai_response(all_broken), openai_response(good)]) as mock_post:
+        slides = generate_slides_outline("TOC", "Alice", "Build a DFA", "2025-01-01", "2025-01-15")
+
+    assert mock_post.call_count == 2
+    assert [s["title"] for s in slides] == ["Cover", "Goals"]
+
+    with patch('llm_helper.get_settings', return_value=OPENAI_SETTINGS), \
+         patch('llm_helper.get_governor', return_value=UNTHROTTLED), \
+         patch('requests.post', side_effect=[openai_response(all_broken), openai_response(all_broken)]):
+        try:
+            generate_slides_outline("TOC", "Alice", "Build a DFA", "2025-01-01", "2025-01-15")
+            assert False, "Expected LLMGenerationError"
+        except LLMGenerationError as e:
+            assert "matches the schema" in e.message
+    print("✅ SUCCESS: One full retry before giving up.")
+
+def test_repaired_slide_validated_at_its_position():
+    print("🧪 Testing Repaired Slides Keep Content-Slide Rules...")
+    # Position 2 is a content slide even though it is the first item of the repair batch
+    slides, broken = validate_slides([{"title": "Repaired", "points": ""}], positions=[2])
+    assert slides == [None] and broken == [0]
+
+    first = json.dumps({"slides": [
+        {"title": "Cover", "subtitle": "Alice", "points": ""},
+        {"title": "Goals", "subtitle": "", "points": "Ship it"},
+        {"title": "Schedule", "subtitle": "", "points": ""},          # broken
+    ]})
+    repair = json.dumps({"slides": [{"title": "Repaired", "subtitle": "", "points": ""}]})
+    with patch('llm_helper.get_settings', return_value=OPENAI_SETTINGS), \
+         patch('llm_helper.get_governor', return_value=UNTHROTTLED), \
+         patch('requests.post', side_effect=[openai_response(first), openai_response(repair)]):
+        slides = generate_slides_outline("TOC", "Alice", "Build a DFA", "2025-01-01", "2025-01-15")
+
+    print(f"📋 {slides}")
+    assert [s["title"] for s in slides] == ["Cover", "Goals"]
+    assert all(s["points"] for s in slides[1:])
+    print("✅ SUCCESS: An empty repaired slide is dropped, not merged.")
+
+if __name__ == "__main__":
+    test_parse_and_validate()
+    test_gemini_schema_conversion()
+    test_only_broken_slides_regenerated()
+    test_all_broken_outline_regenerated_once()
+    test_repaired_slide_validated_at_its_position()